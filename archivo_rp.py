@@ -0,0 +1,288 @@
+"""
+Almacén binario columnar de variantes archivadas (.rpa) para volver a puntuar
+cohortes antiguas sin reprocesar el texto de los ficheros curados.
+
+Un almacén guarda, para todos los registros de todos los aislados (no solo los de
+los loci del panel actual, que puede cambiar):
+  - locus:    uint32, código en el vocabulario de loci (columna 8)
+  - position: int32, posición aminoacídica (columna 13) o INVALID_POSITION
+  - effect:   uint16, código en el vocabulario de consecuencias (columna 5)
+  - alt:      uint16, código en el vocabulario de aminoácidos alternativos
+              (3 últimas letras de la columna 10, p. ej. 'Gln')
+y un índice 'offsets' (uint64) con el primer registro de cada aislado. Los
+vocabularios y los nombres de los aislados van en una cabecera JSON.
+
+El fichero se abre con mmap de solo lectura y las columnas se leen con
+numpy.frombuffer, sin copiarlas: al puntuar, solo se construyen los registros de
+los loci del panel.
+
+    python archivo_rp.py import cohorte.rpa --dir FuentesInformacion
+    python archivo_rp.py score cohorte.rpa --scores SCORES_100WT.json --output scores.csv
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+from array import array
+
+import numpy as np
+
+import automatizacion_rp
+import salida_rp
+from automatizacion_rp_launcher import DEFAULT_SCORES, FORMATS, collect_inputs, isolate_name, iter_variants
+from compilacion_rp import load_panel
+
+
+MAGIC = b"RPARCH01"
+# Posición de los registros cuya columna 13 no es un entero
+INVALID_POSITION = -2 ** 31
+# Columnas: (nombre, tipo de array, dtype de NumPy)
+COLUMNS = (
+    ("locus", "I", "<u4"),
+    ("position", "i", "<i4"),
+    ("effect", "H", "<u2"),
+    ("alt", "H", "<u2"),
+)
+_ALIGN = 8
+
+
+def _intern(vocabulary, codes, value):
+    code = codes.get(value)
+    if code is None:
+        code = codes[value] = len(vocabulary)
+        vocabulary.append(value)
+    return code
+
+
+def _padding(offset):
+    return -offset % _ALIGN
+
+
+def write_archive(path, isolates):
+    """
+    Escribe un almacén a partir de un iterable de (nombre, registros) con las 14
+    columnas del formato curado. Devuelve el número de registros escritos.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("El almacén binario solo se escribe en máquinas little-endian")
+    names = []
+    vocabularies = {"loci": ([], {}), "effects": ([], {}), "alts": ([], {})}
+    loci, effects, alts = (vocabularies[name] for name in ("loci", "effects", "alts"))
+    columns = {name: array(typecode) for name, typecode, _ in COLUMNS}
+    offsets = array("Q", [0])
+    for name, records in isolates:
+        names.append(name)
+        for record in records:
+            try:
+                position = int(record[12])
+            except ValueError:
+                position = INVALID_POSITION
+            columns["locus"].append(_intern(*loci, record[7]))
+            columns["position"].append(position)
+            columns["effect"].append(_intern(*effects, record[4]))
+            columns["alt"].append(_intern(*alts, record[9][-3:]))
+        offsets.append(len(columns["locus"]))
+
+    sections = [("offsets", offsets)] + [(name, columns[name]) for name, _, _ in COLUMNS]
+    header = {
+        "isolates": names,
+        "loci": loci[0],
+        "effects": effects[0],
+        "alts": alts[0],
+        "records": len(columns["locus"]),
+    }
+    # La cabecera se escribe con la posición de cada sección, que depende de su propio tamaño
+    header_size = 0
+    while True:
+        offset = len(MAGIC) + 8 + header_size
+        offset += _padding(offset)
+        layout = {}
+        for name, values in sections:
+            layout[name] = offset
+            offset += len(values) * values.itemsize
+            offset += _padding(offset)
+        header["sections"] = layout
+        encoded = json.dumps(header, separators=(",", ":")).encode()
+        if len(encoded) == header_size:
+            break
+        header_size = len(encoded)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        for name, values in sections:
+            f.write(b"\0" * (layout[name] - f.tell()))
+            values.tofile(f)
+    os.replace(tmp_path, path)
+    return header["records"]
+
+
+def import_files(path, paths, fmt="auto"):
+    """Convierte ficheros de variantes (curados o snps.csv de snippy) en un almacén."""
+    return write_archive(path, ((isolate_name(p), iter_variants(p, None, fmt)) for p in paths))
+
+
+class Archive:
+    """Almacén abierto con mmap de solo lectura."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} no es un almacén de variantes ({MAGIC.decode()})")
+        size = int.from_bytes(self.map[len(MAGIC):len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        header = json.loads(self.map[start:start + size])
+        self.isolates = header["isolates"]
+        self.loci = header["loci"]
+        self.effects = header["effects"]
+        self.alts = header["alts"]
+        self.n_records = header["records"]
+        sections = header["sections"]
+        self.offsets = np.frombuffer(self.map, dtype="<u8", count=len(self.isolates) + 1,
+                                     offset=sections["offsets"])
+        for name, _, dtype in COLUMNS:
+            setattr(self, name, np.frombuffer(self.map, dtype=dtype, count=self.n_records,
+                                              offset=sections[name]))
+        self._effect_flags = None
+
+    def __len__(self):
+        return len(self.isolates)
+
+    def locus_mask(self, loci):
+        """Tabla código de locus -> bool con los loci de 'loci'."""
+        return np.fromiter((locus in loci for locus in self.loci), dtype=bool, count=len(self.loci))
+
+    def records(self, index, loci=None, mask=None):
+        """
+        Registros del aislado 'index' con las 14 columnas del formato curado (solo se
+        rellenan las que usa el cálculo: 5, 8, 10 y 13), limitados a 'loci' si se indica.
+        """
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        if mask is None and loci is not None:
+            mask = self.locus_mask(loci)
+        rows = np.arange(start, end)
+        if mask is not None:
+            rows = rows[mask[self.locus[start:end]]]
+        name = self.isolates[index]
+        for row, locus, position, effect, alt in zip(rows.tolist(), self.locus[rows].tolist(),
+                                                     self.position[rows].tolist(),
+                                                     self.effect[rows].tolist(), self.alt[rows].tolist()):
+            yield (name, "", "", "", self.effects[effect], "", "", self.loci[locus], "",
+                   self.alts[alt], "", "", position if position != INVALID_POSITION else "", "")
+
+    def iter_isolates(self, loci=None):
+        """Genera (nombre, registros) de cada aislado, limitados a 'loci' si se indica."""
+        mask = self.locus_mask(loci) if loci is not None else None
+        for index, name in enumerate(self.isolates):
+            yield name, self.records(index, mask=mask)
+
+    def effect_flags(self):
+        """(missense, lof) por código de consecuencia, como en automatizacion_rp."""
+        if self._effect_flags is None:
+            lowered = [effect.lower() for effect in self.effects]
+            self._effect_flags = (
+                np.array(["missense_variant" in effect for effect in lowered], dtype=bool),
+                np.array(["stop" in effect or "indel" in effect for effect in lowered], dtype=bool),
+            )
+        return self._effect_flags
+
+    def close(self):
+        # Las vistas de NumPy se sueltan antes de cerrar el mmap
+        self.offsets = None
+        for name, _, _ in COLUMNS:
+            setattr(self, name, None)
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def archive_cohort(archive, panel):
+    """
+    Construye la cohorte columnar (cohorte_rp.Cohort) directamente de las columnas
+    del almacén, sin pasar por registros, con el mismo resultado que build_cohort().
+    """
+    from cohorte_rp import Cohort
+
+    loci = sorted(panel.loci)
+    codes = {locus: code for code, locus in enumerate(loci)}
+    remap = np.array([codes.get(locus, -1) for locus in archive.loci], dtype=np.int32)
+    cohort_locus = remap[archive.locus] if len(remap) else np.zeros(0, dtype=np.int32)
+    rows = np.flatnonzero(cohort_locus >= 0)
+    isolate = np.repeat(np.arange(len(archive), dtype=np.int32), np.diff(archive.offsets).astype(np.int64))
+    missense, lof = archive.effect_flags()
+    effect = archive.effect[rows]
+    row_missense = missense[effect] if len(missense) else np.zeros(len(rows), dtype=bool)
+    position = archive.position[rows].astype(np.int64)
+    # Como en build_cohort: la posición solo se conserva en las variantes missense
+    position[(position == INVALID_POSITION) | ~row_missense] = -1
+    return Cohort(
+        isolates=list(archive.isolates),
+        loci=loci,
+        alts=list(archive.alts),
+        isolate=isolate[rows],
+        locus=cohort_locus[rows],
+        position=position,
+        missense=row_missense,
+        lof=lof[effect] if len(lof) else np.zeros(len(rows), dtype=bool),
+        alt=archive.alt[rows].astype(np.int32),
+    )
+
+
+def score_archive(archive, panel):
+    """Puntúa todos los aislados del almacén; genera un IsolateResult por aislado."""
+    for name, records in archive.iter_isolates(panel.loci):
+        final_scores, final_score_eval = automatizacion_rp.score_records(panel, records)
+        yield automatizacion_rp.IsolateResult(name, final_scores, final_score_eval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Almacén binario columnar de variantes archivadas.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="convertir ficheros de variantes en un almacén")
+    importer.add_argument("archive", help="almacén de salida (.rpa)")
+    importer.add_argument("--dir", help="directorio con ficheros *.snps.withoutcommon.curated")
+    importer.add_argument("--glob", help="patrón glob de ficheros de variantes")
+    importer.add_argument("--manifest", help="fichero con una ruta de variantes por línea")
+    importer.add_argument("--format", choices=FORMATS, default="auto", help="formato de las variantes")
+
+    scorer = commands.add_parser("score", help="puntuar todos los aislados de un almacén")
+    scorer.add_argument("archive", help="almacén (.rpa)")
+    scorer.add_argument("--scores", default=DEFAULT_SCORES, help="JSON o Excel (.xlsx) de scores (por defecto %(default)s)")
+    scorer.add_argument("--engine", choices=["records", "columnar"], default="records",
+                        help="registros por aislado o evaluación columnar con NumPy")
+    scorer.add_argument("--output", help="fichero de salida (por defecto, salida estándar)")
+    scorer.add_argument("--output-format", choices=["csv", "jsonl", "parquet"], default="csv")
+
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        paths = collect_inputs(args.dir, args.glob, args.manifest)
+        n_records = import_files(args.archive, paths, args.format)
+        print(f"{args.archive}: {len(paths)} aislados, {n_records} registros")
+        return
+
+    panel = load_panel(args.scores)
+    with Archive(args.archive) as archive:
+        if args.engine == "columnar":
+            import cohorte_rp
+            matrix = cohorte_rp.score_cohort(panel, archive_cohort(archive, panel))
+            results = (automatizacion_rp.IsolateResult(name, dict(zip(automatizacion_rp.ANTIBIOTICS, row.tolist())), None)
+                       for name, row in zip(archive.isolates, matrix))
+        else:
+            results = score_archive(archive, panel)
+        with salida_rp.open_writer(args.output_format, args.output) as writer:
+            writer.write_all(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,30 @@
 import csv
 import json
+from bisect import bisect_right
+from collections import namedtuple
+
+from compilacion_rp import (
+    MODE_GOF, MODE_GOFO, MODE_UNKNOWN, Panel, compile_scores,
+)
+
+# Antibióticos para los que se calcula el score, en el orden de salida
+ANTIBIOTICS = ["CIP", "CAZ", "MER", "C/T", "TOB"]
+
+# Resultado de un aislado: nombre, totales por antibiótico y desglose {locus: score}
+# por antibiótico (final_score_eval; None si el motor no lo calcula).
+IsolateResult = namedtuple("IsolateResult", ["isolate", "scores", "score_eval"])
+
+# Clases de consecuencia (bits) que usan los evaluadores, a partir de la columna 5
+CONSEQUENCE_MISSENSE = 1  # contiene 'missense_variant'
+CONSEQUENCE_LOF = 2       # contiene 'stop' o 'indel'
+
+# Registro ya clasificado que consumen los evaluadores de reglas compiladas:
+#   - locus: columna 8.
+#   - consequence: bits CONSEQUENCE_* de la columna 5 (en minúsculas).
+#   - position: posición aminoacídica (columna 13) o None si la variante no es missense
+#     o la posición no es un entero (en ambos casos match_alleles() no la considera).
+#   - alt: aminoácido alternativo (3 últimas letras de la columna 10); vacío si position es None.
+Variant = namedtuple("Variant", ["locus", "consequence", "position", "alt"])
 
 
 def effect_multiplier(effect):
@@ -138,7 +163,50 @@ def evaluate_condition(record, condition):
     return reg_result
 
 
-def evaluate_regulators(gene, condition, records):
+def index_records(records):
+    """
+    Agrupa los registros por locus (columna 8, índice 7) en un diccionario
+    locus -> lista de registros, conservando el orden original dentro de cada locus.
+    Se construye una sola vez por aislado para que las búsquedas de los evaluadores
+    no tengan que recorrer la lista completa de registros.
+    """
+    index = {}
+    for record in records:
+        index.setdefault(record[7], []).append(record)
+    return index
+
+
+def classify_record(record):
+    """Clasifica un registro de 14 columnas en un Variant (una sola vez por registro)."""
+    effect = record[4].lower()
+    consequence = CONSEQUENCE_LOF if "stop" in effect or "indel" in effect else 0
+    position = None
+    alt = ""
+    if "missense_variant" in effect:
+        consequence |= CONSEQUENCE_MISSENSE
+        try:
+            position = int(record[12])
+        except ValueError:
+            pass
+        else:
+            alt = record[9][-3:]
+    return Variant(record[7], consequence, position, alt)
+
+
+def index_variants(records):
+    """
+    Igual que index_records(), pero clasificando cada registro con classify_record():
+    devuelve locus -> lista de Variant, que es lo que consumen los evaluadores de
+    reglas compiladas.
+    """
+    index = {}
+    for record in records:
+        variant = classify_record(record)
+        index.setdefault(variant.locus, []).append(variant)
+    return index
+
+
+def evaluate_regulators(gene, condition, index):
     """
     Evalúa la condición cuando 'regulators' es "YES".
     Se consideran dos niveles:
@@ -154,26 +222,21 @@ def evaluate_regulators(gene, condition, records):
       - Si no se cumple el primer nivel, se suma el main_score (o el simple_value de la condición principal).
       - Si se cumple el nivel de reguladores pero no la condición principal, se suma el simple_value.
     (La lógica puede ajustarse según la interpretación de los requisitos.)
+    'index' es el diccionario locus -> registros generado por index_records().
     """
     # Registros correspondientes al gen principal
-    main_records = [r for r in records if r[7] == gene]
+    main_records = index.get(gene, [])
     # Se obtienen las claves de los sub-loci
     subloci = condition.get("loci", {})
-    # Se recopilan todos los registros que pertenezcan a alguno de los sub-loci
-    sub_records = []
-    for sub in subloci:
-        sub_records.extend([r for r in records if r[7] == sub])
 
     # Evaluar los sub-loci: verificar si existe al menos un registro que cumpla la condición del sublocus y sumar su valor si se cumplen las condiciones
     regulator_pass = False
     regulator_value = 0
-    for sub in sub_records:
+    for sub in subloci:
         if regulator_pass:
             break
-    # for sub in subloci:
-        sub_cond = subloci[sub[7]]
-        sub_recs = [r for r in records if r[7] == sub[7]]
-        for rec in sub_recs:
+        sub_cond = subloci[sub]
+        for rec in index.get(sub, []):
 ####
 ## En la siguiente condición solamente se tiene en cuenta el primer regulador cuyo efecto es diferente de 0, si hay 2 con efecto deberían sumarse los 2?? ************************************************************
 ####
@@ -213,64 +276,214 @@ def evaluate_regulators(gene, condition, records):
     return main_score
 
 
-def main(scores_json, records):
-    # # Cargar condiciones desde el JSON
-    # scores_json = load_scores("FuentesInformacion/SCORES_100WT.json")
-    # # Cargar registros del CSV (se asume que el archivo tiene 14 columnas separadas por comas)
-    # records = load_csv("FuentesInformacion/PA001.snps.withoutcommon.curated")
+def match_alleles(variant, rule):
+    """
+    Equivalente de evaluate_GOF() sobre una regla compilada y un registro ya clasificado
+    (Variant): las posiciones exactas se buscan en la tabla 'positions' y los rangos por
+    búsqueda binaria en el índice de intervalos 'ranges', sin volver a convertir las
+    claves del JSON ni a analizar la columna 5 en cada evaluación.
+    Devuelve "double", "simple" o None con el mismo criterio que evaluate_GOF().
+    """
+    allele_num = variant.position
+    if allele_num is None:
+        return None
+
+    no_lof = not variant.consequence & CONSEQUENCE_LOF
+    if rule.any_allele:
+        return "double" if no_lof else None
+
+    expected = rule.positions.get(allele_num)
+    if expected is not None:
+        any_aa, values = expected
+        if (any_aa and no_lof) or variant.alt in values:
+            return "double"
+        return "simple"
+
+    if rule.ranges:
+        # Último intervalo que empieza en o antes de la posición (los intervalos son disjuntos)
+        index = bisect_right(rule.range_starts, allele_num) - 1
+        if index >= 0 and allele_num <= rule.ranges[index][1]:
+            return "double"
+    return None
+
+
+def evaluate_rule(variant, rule):
+    """
+    Equivalente de evaluate_condition() sobre una regla compilada y un registro ya
+    clasificado (Variant). Devuelve la tupla (reg_eval, value) en lugar del diccionario.
+    """
+    mode = rule.mode
+    if mode == MODE_GOF or mode == MODE_GOFO:
+        if match_alleles(variant, rule) == "double":
+            return 1, rule.doble_value
+        # Para GOF se suma simple_value si no coincide el alelo;
+        # Para GOFO, si no hay coincidencia, no se suma nada.
+        if mode == MODE_GOF:
+            return 1, rule.simple_value
+        return 0, 0
+    if mode == MODE_UNKNOWN:
+        print(f'Error in mut_type value for {variant.locus} it is none of LOF, GOF or GOFO')
+        return 0, 0
+    return rule.constant
+
+
+def evaluate_rule_regulators(gene, rule, index, evaluate=None):
+    """
+    Equivalente de evaluate_regulators() sobre una regla compilada: se suma el valor del
+    primer registro de los sub-loci (en el orden del JSON) que cumple su condición y el
+    score de todos los registros del gen principal.
+    'evaluate' sustituye a evaluate_rule() (p. ej. con resultados compartidos entre paneles).
+    """
+    evaluate = evaluate or evaluate_rule
+    regulator_value = 0
+    for locus, sub_rule in rule.loci:
+        for rec in index.get(locus, ()):
+            reg_eval, value = evaluate(rec, sub_rule)
+            if reg_eval != 0:
+                regulator_value = value
+                break
+        else:
+            continue
+        break
+
+    main_score = 0
+    for rec in index.get(gene, ()):
+        main_score += evaluate(rec, rule)[1]
+    return main_score + regulator_value
+
+
+def score_gene(entry, index, evaluate=None):
+    """
+    Genera las contribuciones (antibiótico, locus, score) de una entrada del panel
+    compilado (GeneEntry) para el índice de registros clasificados de un aislado
+    (index_variants()).
+    'evaluate' sustituye a evaluate_rule() (p. ej. con resultados compartidos entre paneles).
+    """
+    evaluate = evaluate or evaluate_rule
+    # Caso en el que son varios genes principales, no los reguladores los que determinan si se suma score o no
+    if entry.multi:
+        gene_active = True
+        # Siempre van a tener reguladores
+        for sub_gene in entry.genes:
+            if any(variant.consequence & CONSEQUENCE_LOF for variant in index.get(sub_gene, ())):
+                gene_active = False
+                break
+
+        if gene_active:
+            for ab, rule in entry.rules:
+                for sub_gene in entry.genes:
+                    yield ab, sub_gene, evaluate_rule_regulators(sub_gene, rule, index, evaluate)
+
+    mutations = index.get(entry.key)
+    if mutations:
+        for ab, rule in entry.rules:
+            # Se verifica el tipo de evaluación según el campo "regulators"
+            if rule.regulators == "NO":
+                for mutation in mutations:
+                    yield ab, entry.key, evaluate(mutation, rule)[1]
+            elif rule.regulators == "YES":
+                # Para condiciones con reguladores, se evalúa con la función especializada
+                yield ab, entry.key, evaluate_rule_regulators(entry.key, rule, index, evaluate)
+
+
+def score_records(scores_json, records):
+    """
+    Calcula los scores de un aislado sin mostrarlos. Devuelve la tupla
+    (final_scores, final_score_eval) con los totales por antibiótico y la lista de
+    contribuciones {locus: score} de cada antibiótico.
+    'scores_json' puede ser el diccionario cargado del JSON o el Panel ya compilado.
+    """
+    panel = scores_json if isinstance(scores_json, Panel) else compile_scores(scores_json)
 
     # Inicializar diccionario de scores para cada antibiótico
-    antibiotics = ["CIP", "CAZ", "MER", "C/T", "TOB"]
-    final_scores = {ab: 0 for ab in antibiotics}
-    final_score_eval = {ab: [] for ab in antibiotics}
-
-    gene_records = [r for r in records if r[7] in scores_json]
-    gene_list = [r[7] for r in gene_records]
-
-    # Recorrer cada gen (locus) definido en el JSON
-    for gene, conditions in scores_json.items():
-        # Caso en el que son varios genes principales, no los reguladores los que determinan si se suma score o no
-        if ',' in gene:
-            genes = gene.split(',')
-            gene_records_test = [r for r in records if r[7] in genes]
-            gene_active = True
-            score = 0
-
-            # Siempre van a tener reguladores
-            for gene_record in gene_records_test:
-                if evaluate_LOF(gene_record) == 'LOF':
-                    gene_active = False
-                    break
-
-            if gene_active:
-                for ab, cond in conditions.items():
-                    for sub_gene in genes:
-                        score = evaluate_regulators(sub_gene, cond, records)
-                        final_scores[ab] += score
-                        final_score_eval[ab].append({sub_gene: score})
-
-        # Para cada antibiótico (condición) en el gen
-        if gene in gene_list:
-            mutations = [r for r in gene_records if r[7] == gene]
-            for ab, cond in conditions.items():
-                # Se verifica el tipo de evaluación según el campo "regulators"
-                if cond.get("regulators") == "NO":
-                    # Se filtran los registros cuya columna 8 (índice 7) coincide con el gen
-                    for mutation in mutations:
-                        score = evaluate_condition(mutation, cond)['value']
-                        final_scores[ab] += score
-                        final_score_eval[ab].append({gene: score})
-
-                elif cond.get("regulators") == "YES":
-                    # Para condiciones con reguladores, se evalúa con la función especializada
-                    score = evaluate_regulators(gene, cond, records)
-                    final_scores[ab] += score
-                    final_score_eval[ab].append({gene: score})
-
-
-    # Mostrar el score final por antibiótico
-    print("Total scores by ATB:")
-    for ab, score in final_scores.items():
-        print(f"{ab}: {score}")
-    for ab, scores in final_score_eval.items():
-        print(f"{ab}: {scores}")
\ No newline at end of file
+    final_scores = {ab: 0 for ab in ANTIBIOTICS}
+    final_score_eval = {ab: [] for ab in ANTIBIOTICS}
+
+    # Los registros se clasifican y agrupan por locus una sola vez; todas las búsquedas posteriores se hacen sobre el índice
+    index = index_variants(records)
+
+    # Recorrer cada gen (locus) definido en el panel
+    for entry in panel.genes:
+        for ab, gene, score in score_gene(entry, index):
+            final_scores[ab] += score
+            final_score_eval[ab].append({gene: score})
+
+    return final_scores, final_score_eval
+
+
+def rule_signature(rule):
+    """
+    Clave con los campos de una regla que determinan el resultado de evaluate_rule()
+    (los valores se comparan por su repr para no confundir 1 con 1.0 en la salida).
+    """
+    positions = tuple(sorted(
+        (position, any_aa, tuple(sorted(values))) for position, (any_aa, values) in rule.positions.items()
+    ))
+    return (rule.mode, repr(rule.simple_value), repr(rule.doble_value), repr(rule.constant),
+            rule.any_allele, positions, rule.ranges)
+
+
+def rule_tokens(panels):
+    """
+    Asigna a cada regla de los paneles (incluidas las de los sub-loci) un número común
+    a todas las reglas equivalentes. Devuelve el diccionario id(regla) -> número, válido
+    mientras los paneles sigan en memoria.
+    """
+    signatures = {}
+    tokens = {}
+
+    def visit(rule):
+        tokens[id(rule)] = signatures.setdefault(rule_signature(rule), len(signatures))
+        for _, sub_rule in rule.loci:
+            visit(sub_rule)
+
+    for panel in panels:
+        for entry in panel.genes:
+            for _, rule in entry.rules:
+                visit(rule)
+    return tokens
+
+
+def score_panels(panels, records, tokens=None):
+    """
+    Calcula los scores de un aislado con varios paneles compilados en una sola pasada:
+    los registros se indexan una vez y cada par (registro, regla equivalente) se evalúa
+    una sola vez aunque la regla se repita en varios paneles o antibióticos.
+    Devuelve una lista con el (final_scores, final_score_eval) de cada panel, igual que
+    score_records() con cada uno. 'tokens' es el resultado de rule_tokens(panels), que
+    conviene calcular una vez para todos los aislados.
+    """
+    tokens = tokens if tokens is not None else rule_tokens(panels)
+    index = index_variants(records)
+    evaluations = {}
+
+    def evaluate(record, rule):
+        key = (id(record), tokens[id(rule)])
+        result = evaluations.get(key)
+        if result is None:
+            result = evaluations[key] = evaluate_rule(record, rule)
+        return result
+
+    results = []
+    for panel in panels:
+        final_scores = {ab: 0 for ab in ANTIBIOTICS}
+        final_score_eval = {ab: [] for ab in ANTIBIOTICS}
+        for entry in panel.genes:
+            for ab, gene, score in score_gene(entry, index, evaluate):
+                final_scores[ab] += score
+                final_score_eval[ab].append({gene: score})
+        results.append((final_scores, final_score_eval))
+    return results
+
+
+def main(scores_json, records, isolate=None, sinks=()):
+    """
+    Calcula los scores por antibiótico de un aislado y devuelve un IsolateResult.
+    Cada escritor de 'sinks' (p. ej. salida_rp.ConsoleWriter para la salida legible
+    por consola) recibe el resultado con write().
+    """
+    final_scores, final_score_eval = score_records(scores_json, records)
+    result = IsolateResult(isolate, final_scores, final_score_eval)
+    for sink in sinks:
+        sink.write(result)
+    return result
@@ -1,6 +1,29 @@
 import automatizacion_rp
+import salida_rp
+import argparse
 import json
 import csv
+import os
+import re
+
+from compilacion_rp import load_panel
+
+# glob, concurrent.futures, cache_rp, cohorte_rp (NumPy) y perfil_rp se importan solo en
+# los caminos que los usan: el modo de un aislado, que Nextflow lanza una vez por
+# tarea, no paga su coste de arranque (ver benchmarks/bench_arranque.py)
+
+
+DEFAULT_SCORES = "FuentesInformacion/SCORES_100WT.json"
+DEFAULT_ISOLATE = "FuentesInformacion/PA001.snps.withoutcommon.curated"
+CURATED_PATTERN = "*.snps.withoutcommon.curated"
+
+# Cabecera del snps.csv de snippy y formatos de entrada admitidos
+SNIPPY_HEADER = "CHROM,POS,TYPE,REF,ALT,EVIDENCE,FTYPE,STRAND,NT_POS,AA_POS,EFFECT,LOCUS_TAG,GENE,PRODUCT"
+FORMATS = ("auto", "curated", "snippy")
+
+# EFFECT de snippy: "<consecuencia> <notación c./n.> <notación p.>", las dos últimas opcionales
+SNIPPY_EFFECT = re.compile(r"(\S*)(?: +([cn]\.\S*))?(?: +(p\.\S*))?")
+
 
 def load_scores(json_file):
     """Carga el diccionario de condiciones desde el archivo JSON."""
@@ -20,10 +43,325 @@ def load_csv(csv_file):
     return records
 
 
-if __name__ == "__main__":
-    # Cargar condiciones desde el JSON
-    scores_json = load_scores("FuentesInformacion/SCORES_100WT.json")
-    # Cargar registros del CSV (se asume que el archivo tiene 14 columnas separadas por comas)
-    records = load_csv("FuentesInformacion/PA001.snps.withoutcommon.curated")
+def iter_csv(csv_file, loci=None):
+    """
+    Lee los registros del archivo CSV de forma perezosa (generador).
+    Si se indica 'loci' (p. ej. Panel.loci), solo se generan las filas cuyo locus
+    (columna 8, índice 7) pertenece a ese conjunto: el locus se extrae de la línea
+    sin trocearla entera y el resto de filas se descartan antes de construir la lista.
+    Las líneas con comillas se procesan con csv.reader para respetar el formato CSV.
+    """
+    with open(csv_file, newline="") as f:
+        yield from iter_curated_lines(f, loci)
+
+
+def iter_curated_lines(lines, loci=None):
+    """Igual que iter_csv() sobre un iterable de líneas (p. ej. el cuerpo de una petición)."""
+    for line in lines:
+        if '"' in line:
+            row = next(csv.reader([line]), [])
+            if len(row) > 7 and (loci is None or row[7] in loci):
+                yield row
+            continue
+        head = line.split(',', 8)
+        if len(head) < 9 or (loci is not None and head[7] not in loci):
+            continue
+        yield line.rstrip("\r\n").split(',')
+
+
+def _split_fraction(value):
+    """Separa los campos de snippy tipo "429/1545" en (posición, longitud)."""
+    position, _, length = value.partition('/')
+    return position, length
+
+
+def snippy_record(row, isolate):
+    """
+    Convierte una fila del snps.csv de snippy en un registro con las 14 columnas
+    del formato .withoutcommon.curated. snippy no informa del impacto (columna 6),
+    que queda vacío, y la columna 7 toma el nombre del gen o, si no lo hay, el locus.
+    """
+    consequence, c_notation, p_notation = SNIPPY_EFFECT.match(row[10]).groups()
+    nt_pos, nt_len = _split_fraction(row[8])
+    aa_pos, aa_len = _split_fraction(row[9])
+    gene = row[12] if len(row) > 13 else ''
+    return [isolate, row[1], row[3], row[4], consequence, '', gene or row[11], row[11],
+            c_notation or '', p_notation or '', nt_pos, nt_len, aa_pos, aa_len]
+
+
+def iter_snippy(csv_file, loci=None, isolate=None, keep_synonymous=False):
+    """
+    Lee directamente el snps.csv de snippy (generador) y devuelve registros en el
+    formato .withoutcommon.curated, sin pasar por ficheros intermedios.
+    Igual que iter_csv(), si se indica 'loci' solo se generan las filas de esos loci.
+    Las filas sin anotación (sin LOCUS_TAG) se descartan y, como en los ficheros
+    curados, también las variantes sinónimas salvo que se pida 'keep_synonymous'.
+    El filtrado de variantes comunes de la curación no se aplica aquí.
+    """
+    isolate = isolate or isolate_name(csv_file)
+    with open(csv_file, newline="") as f:
+        yield from iter_snippy_lines(f, loci, isolate, keep_synonymous)
+
+
+def iter_snippy_lines(lines, loci=None, isolate=None, keep_synonymous=False):
+    """Igual que iter_snippy() sobre un iterable de líneas; 'isolate' es el nombre del aislado."""
+    for number, line in enumerate(lines):
+        if number == 0 and line.startswith("CHROM,"):
+            continue
+        if '"' in line:
+            row = next(csv.reader([line]), [])
+        else:
+            row = line.rstrip("\r\n").split(',')
+        if len(row) < 12 or not row[11] or (loci is not None and row[11] not in loci):
+            continue
+        if not keep_synonymous and row[10].startswith("synonymous_variant "):
+            continue
+        yield snippy_record(row, isolate)
+
+
+def detect_format(path):
+    """Detecta si un fichero de variantes es un snps.csv de snippy o un fichero curado."""
+    with open(path, newline="") as f:
+        first = f.readline()
+    return "snippy" if first.startswith("CHROM,") else "curated"
+
+
+def iter_variants(path, loci=None, fmt="auto"):
+    """Lee un fichero de variantes en el formato indicado ('auto' lo detecta por la cabecera)."""
+    if fmt == "auto":
+        fmt = detect_format(path)
+    if fmt == "snippy":
+        return iter_snippy(path, loci)
+    return iter_csv(path, loci)
+
+
+def isolate_name(path):
+    """
+    Nombre del aislado a partir del fichero (PA001.snps.withoutcommon.curated -> PA001).
+    Para la salida de snippy (<aislado>/snps.csv) se usa el nombre del directorio.
+    """
+    name = os.path.basename(path).split('.')[0]
+    if name == "snps":
+        name = os.path.basename(os.path.dirname(os.path.abspath(path))) or name
+    return name
+
+
+def collect_inputs(directory=None, pattern=None, manifest=None):
+    """
+    Reúne la lista de ficheros de variantes a puntuar a partir de un directorio
+    (se toman los *.snps.withoutcommon.curated), un patrón glob y/o un manifiesto
+    (una ruta por línea; las líneas vacías y las que empiezan por '#' se ignoran).
+    """
+    import glob
 
-    automatizacion_rp.main(scores_json, records)
\ No newline at end of file
+    paths = []
+    if directory:
+        paths.extend(sorted(glob.glob(os.path.join(directory, CURATED_PATTERN))))
+    if pattern:
+        paths.extend(sorted(glob.glob(pattern)))
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+    # Se eliminan duplicados conservando el orden
+    return list(dict.fromkeys(paths))
+
+
+# Panel compilado, formato de entrada y caché de resultados de cada proceso del pool;
+# se cargan una sola vez en el initializer
+_worker_panel = None
+_worker_format = "auto"
+_worker_cache = None
+_worker_profile = False
+# Con varios paneles: (paneles, nombres, rule_tokens(), unión de sus loci)
+_worker_panels = None
+
+
+def panel_labels(scores_files):
+    """Nombre de cada panel en la salida: el del fichero sin extensión (los repetidos se numeran)."""
+    labels = []
+    for scores_file in scores_files:
+        label = os.path.splitext(os.path.basename(scores_file))[0]
+        if label in labels:
+            label = f"{label}_{len(labels) + 1}"
+        labels.append(label)
+    return labels
+
+
+def load_panels(scores_files):
+    """Carga varios paneles para puntuarlos juntos: (paneles, nombres, rule_tokens(), unión de sus loci)."""
+    panels = [load_panel(scores_file) for scores_file in scores_files]
+    loci = frozenset().union(*(panel.loci for panel in panels))
+    return panels, panel_labels(scores_files), automatizacion_rp.rule_tokens(panels), loci
+
+
+def score_panels(loaded, records):
+    """
+    Puntúa los registros de un aislado con todos los paneles de load_panels() en una
+    sola pasada. Devuelve (final_scores, final_score_eval) con un nivel más por panel:
+    {panel: {antibiótico: score}} y {panel: {antibiótico: contribuciones}}.
+    """
+    panels, labels, tokens, _ = loaded
+    results = automatizacion_rp.score_panels(panels, records, tokens)
+    return ({label: scores for label, (scores, _) in zip(labels, results)},
+            {label: score_eval for label, (_, score_eval) in zip(labels, results)})
+
+
+def _init_worker(scores_file, fmt="auto", cache_path=None, cache_max_bytes=None, profile=False):
+    global _worker_panel, _worker_panels, _worker_format, _worker_cache, _worker_profile
+    if isinstance(scores_file, (list, tuple)):
+        _worker_panels = load_panels(scores_file)
+    else:
+        _worker_panel = load_panel(scores_file)
+    _worker_format = fmt
+    if cache_path:
+        import cache_rp
+        _worker_cache = cache_rp.ResultCache(cache_path, cache_max_bytes or cache_rp.DEFAULT_MAX_BYTES)
+    if profile:
+        import perfil_rp
+        perfil_rp.enable()
+        _worker_profile = True
+
+
+def _score_path(path):
+    if _worker_panels is not None:
+        return score_panels(_worker_panels, iter_variants(path, _worker_panels[3], _worker_format))
+    records = iter_variants(path, _worker_panel.loci, _worker_format)
+    return automatizacion_rp.score_records(_worker_panel, records)
+
+
+def _score_file(path):
+    isolate = isolate_name(path)
+    if _worker_profile:
+        import perfil_rp
+        perfil_rp.ACTIVE.isolate = isolate
+    if _worker_cache is not None:
+        import cache_rp
+        final_scores, final_score_eval = cache_rp.cached_score(_worker_cache, _worker_panel, path, _score_path)
+    else:
+        final_scores, final_score_eval = _score_path(path)
+    result = automatizacion_rp.IsolateResult(isolate, final_scores, final_score_eval)
+    if _worker_profile:
+        # El informe de cada aislado se devuelve al proceso principal, que los acumula
+        report = perfil_rp.ACTIVE.report()
+        perfil_rp.ACTIVE.reset()
+        return result, report
+    return result
+
+
+def score_batch(paths, scores_file=DEFAULT_SCORES, workers=None, chunksize=1, fmt="auto",
+                cache_path=None, cache_max_bytes=None, profiler=None):
+    """
+    Puntúa todos los aislados de 'paths' en paralelo con un pool de procesos.
+    Genera un IsolateResult por aislado en el mismo orden que 'paths'.
+    Con 'cache_path' se reutilizan los resultados de la caché (cache_rp.ResultCache)
+    de los aislados cuyo fichero de variantes y panel no han cambiado.
+    Con 'profiler' (perfil_rp.Profiler) los procesos del pool se instrumentan y sus
+    métricas se acumulan en él.
+    Si 'scores_file' es una lista de ficheros, cada aislado se puntúa con todos esos
+    paneles a la vez (ver score_panels()).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Se compila (o se valida la caché) antes de arrancar el pool para que los workers solo lean el plan
+    for panel_file in (scores_file if isinstance(scores_file, (list, tuple)) else [scores_file]):
+        load_panel(panel_file)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(scores_file, fmt, cache_path, cache_max_bytes,
+                                       profiler is not None)) as executor:
+        for item in executor.map(_score_file, paths, chunksize=chunksize):
+            if profiler is not None:
+                item, report = item
+                profiler.merge(report)
+            yield item
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cálculo de scores de resistencia por aislado.")
+    parser.add_argument("--scores", nargs="+", default=[DEFAULT_SCORES],
+                        help="JSON o Excel (.xlsx) de scores (por defecto %(default)s); con varios ficheros "
+                             "se puntúa con todos los paneles en una sola pasada y se muestran uno al lado del otro")
+    parser.add_argument("--isolate", default=DEFAULT_ISOLATE, help="fichero de variantes de un único aislado")
+    parser.add_argument("--dir", help="directorio con ficheros *.snps.withoutcommon.curated")
+    parser.add_argument("--glob", help="patrón glob de ficheros de variantes")
+    parser.add_argument("--manifest", help="fichero con una ruta de variantes por línea")
+    parser.add_argument("--format", choices=FORMATS, default="auto",
+                        help="formato de las variantes: curado (14 columnas), snps.csv de snippy o autodetección")
+    parser.add_argument("--workers", type=int, default=None, help="procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--chunksize", type=int, default=1, help="aislados enviados a cada proceso por tarea")
+    parser.add_argument("--engine", choices=["pool", "columnar"], default="pool",
+                        help="motor del modo lote: pool de procesos o evaluación columnar con NumPy")
+    parser.add_argument("--cache", nargs="?", const="default", metavar="PATH",
+                        help="reutilizar resultados de la caché SQLite (sin ruta, la de por defecto)")
+    parser.add_argument("--cache-max-mb", type=float, default=None,
+                        help="tamaño máximo de la caché de resultados en MB")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="instrumentar el cálculo y guardar el informe JSON por función, regla y aislado")
+    parser.add_argument("--output", help="fichero de salida del modo lote (por defecto, salida estándar)")
+    parser.add_argument("--output-format", choices=["csv", "jsonl", "parquet"], default="csv",
+                        help="formato de la salida del modo lote")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="aislados que se acumulan antes de escribirlos en la salida")
+    args = parser.parse_args(argv)
+    if len(args.scores) > 1 and (args.engine == "columnar" or args.cache):
+        parser.error("con varios paneles no se admiten --engine columnar ni --cache")
+    return args
+
+
+def run(argv=None):
+    """Punto de entrada de línea de comandos (modo de un aislado o modo lote)."""
+    args = parse_args(argv)
+    profiler = None
+    if args.profile:
+        import perfil_rp
+        profiler = perfil_rp.enable()
+
+    # Con un único panel se conserva la salida de siempre; con varios, una columna/bloque por panel
+    labels = panel_labels(args.scores) if len(args.scores) > 1 else None
+    scores_file = args.scores if labels else args.scores[0]
+
+    if args.dir or args.glob or args.manifest:
+        paths = collect_inputs(args.dir, args.glob, args.manifest)
+        if args.engine == "columnar":
+            import cohorte_rp
+            panel = load_panel(scores_file)
+            cohort = cohorte_rp.load_cohort(paths, panel, args.format)
+            matrix = cohorte_rp.score_cohort(panel, cohort)
+            results = (automatizacion_rp.IsolateResult(isolate, dict(zip(automatizacion_rp.ANTIBIOTICS, row.tolist())), None)
+                       for isolate, row in zip(cohort.isolates, matrix))
+        else:
+            cache_path = None
+            if args.cache:
+                import cache_rp
+                cache_path = cache_rp.default_cache_path() if args.cache == "default" else args.cache
+            cache_max_bytes = int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None
+            results = score_batch(paths, scores_file, args.workers, args.chunksize, args.format,
+                                  cache_path, cache_max_bytes, profiler)
+        with salida_rp.open_writer(args.output_format, args.output, args.batch_size, labels) as writer:
+            writer.write_all(results)
+    elif labels:
+        loaded = load_panels(args.scores)
+        final_scores, final_score_eval = score_panels(loaded, iter_variants(args.isolate, loaded[3], args.format))
+        result = automatizacion_rp.IsolateResult(isolate_name(args.isolate), final_scores, final_score_eval)
+        salida_rp.ConsoleWriter(panels=labels).write(result)
+    else:
+        # Cargar el panel compilado a partir del JSON o del Excel (se reutiliza la caché en disco si no ha cambiado)
+        scores_json = load_panel(scores_file)
+        # Leer registros del CSV (se asume que el archivo tiene 14 columnas separadas por comas),
+        # conservando solo los loci que aparecen en el panel
+        records = iter_variants(args.isolate, scores_json.loci, args.format)
+
+        automatizacion_rp.main(scores_json, records, isolate_name(args.isolate), sinks=[salida_rp.ConsoleWriter()])
+
+    if profiler is not None:
+        profiler.write(args.profile)
+
+
+if __name__ == "__main__":
+    # Se ejecuta a través del módulo importado para que perfil_rp y los procesos del pool
+    # trabajen sobre las mismas funciones que el resto de módulos
+    import automatizacion_rp_launcher
+    automatizacion_rp_launcher.run()
@@ -0,0 +1,72 @@
+"""
+Compara volver a puntuar una cohorte archivada desde los ficheros curados (texto)
+y desde el almacén binario de archivo_rp, y verifica que los resultados coinciden.
+
+    python benchmarks/bench_archivo.py --isolates 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import automatizacion_rp
+import archivo_rp
+import cohorte_rp
+from automatizacion_rp_launcher import DEFAULT_SCORES, iter_csv
+from compilacion_rp import load_panel
+from sinteticos import synthetic_records, write_curated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--isolates", type=int, default=500)
+    parser.add_argument("--variants", type=int, default=8000, help="variantes por aislado")
+    parser.add_argument("--scores", default=os.path.join(ROOT, DEFAULT_SCORES))
+    args = parser.parse_args()
+
+    panel = load_panel(args.scores)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for number in range(args.isolates):
+            path = os.path.join(directory, f"S{number}.snps.withoutcommon.curated")
+            write_curated(path, synthetic_records(rng, f"S{number}", args.variants, panel.loci))
+            paths.append(path)
+        archive_path = os.path.join(directory, "cohorte.rpa")
+
+        start = time.perf_counter()
+        archivo_rp.import_files(archive_path, paths)
+        import_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [automatizacion_rp.score_records(panel, iter_csv(path, panel.loci)) for path in paths]
+        text_time = time.perf_counter() - start
+
+        with archivo_rp.Archive(archive_path) as archive:
+            start = time.perf_counter()
+            results = [(result.scores, result.score_eval) for result in archivo_rp.score_archive(archive, panel)]
+            archive_time = time.perf_counter() - start
+            start = time.perf_counter()
+            cohorte_rp.score_cohort(panel, archivo_rp.archive_cohort(archive, panel))
+            columnar_time = time.perf_counter() - start
+
+        if results != expected:
+            raise SystemExit("El almacén binario no coincide con los ficheros curados")
+        text_size = sum(os.path.getsize(path) for path in paths)
+        archive_size = os.path.getsize(archive_path)
+
+    print(f"aislados: {args.isolates}  variantes: {args.isolates * args.variants}")
+    print(f"tamaño texto / almacén:     {text_size / 2 ** 20:.1f} / {archive_size / 2 ** 20:.1f} MiB")
+    print(f"importación:                {import_time:.3f} s")
+    print(f"ficheros curados:           {text_time:.3f} s")
+    print(f"almacén (registros):        {archive_time:.3f} s  (x{text_time / archive_time:.1f})")
+    print(f"almacén (columnar):         {columnar_time:.3f} s  (x{text_time / columnar_time:.1f})")
+
+
+if __name__ == "__main__":
+    main()
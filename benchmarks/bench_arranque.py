@@ -0,0 +1,76 @@
+"""
+Comprueba el presupuesto de arranque del modo de un aislado (puntuar_rp.py), que es
+el que se ejecuta una vez por tarea cuando Nextflow lanza un proceso por aislado.
+
+Mide la mediana del tiempo total de varias ejecuciones (con la caché del panel ya
+compilada) y verifica que no se importan módulos pesados. Termina con código 1 si
+se supera el presupuesto o se importa alguno de ellos.
+
+    python benchmarks/bench_arranque.py --budget 0.15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# Módulos que el modo de un aislado no debe importar
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "sqlite3", "concurrent.futures", "multiprocessing", "zipfile")
+
+
+def wall_time(command, repeat):
+    """Mediana del tiempo total de 'command' en segundos."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def imported_modules(command):
+    """Módulos importados por 'command' según python -X importtime."""
+    process = subprocess.run(command[:1] + ["-X", "importtime"] + command[1:], cwd=ROOT,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    modules = set()
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=0.15, help="tiempo máximo por ejecución en segundos")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--scores", default="FuentesInformacion/SCORES_100WT.json")
+    parser.add_argument("--isolate", default="FuentesInformacion/PA001.snps.withoutcommon.curated")
+    args = parser.parse_args()
+
+    command = [sys.executable, "puntuar_rp.py", "--scores", args.scores, "--isolate", args.isolate]
+    # Primera ejecución: compila el panel en la caché si aún no lo estaba
+    subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+
+    interpreter = wall_time([sys.executable, "-c", "pass"], args.repeat)
+    elapsed = wall_time(command, args.repeat)
+    heavy = sorted(module for module in imported_modules(command)
+                   if module.split(".")[0] in HEAVY_MODULES or module in HEAVY_MODULES)
+
+    print(f"intérprete vacío:  {interpreter:.3f} s")
+    print(f"puntuar_rp.py:     {elapsed:.3f} s (presupuesto {args.budget:.3f} s)")
+    failed = False
+    if elapsed > args.budget:
+        print("  <-- PRESUPUESTO SUPERADO")
+        failed = True
+    if heavy:
+        print(f"módulos pesados importados: {', '.join(heavy)}")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
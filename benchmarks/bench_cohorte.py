@@ -0,0 +1,68 @@
+"""
+Compara el motor columnar (cohorte_rp.score_cohort) con el bucle por aislado
+(automatizacion_rp.score_records) sobre una cohorte sintética.
+
+    python benchmarks/bench_cohorte.py --isolates 10000
+    python benchmarks/bench_cohorte.py --decimal-values   # valores 0.1, 0.3... en el panel
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import automatizacion_rp
+import cohorte_rp
+from automatizacion_rp_launcher import DEFAULT_SCORES, iter_csv
+from compilacion_rp import compile_scores, load_compiled_scores
+from sinteticos import decimal_panel, synthetic_cohort
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--isolates", type=int, default=10000)
+    parser.add_argument("--scores", default=os.path.join(ROOT, DEFAULT_SCORES))
+    parser.add_argument("--decimal-values", action="store_true",
+                        help="sustituir los valores del panel por decimales no exactos en binario")
+    args = parser.parse_args()
+
+    root = os.path.join(ROOT, "FuentesInformacion")
+    if args.decimal_values:
+        with open(args.scores) as f:
+            panel = compile_scores(decimal_panel(json.load(f)))
+    else:
+        panel = load_compiled_scores(args.scores)
+    real_records = [r for path in sorted(glob.glob(os.path.join(root, "*.snps.withoutcommon.curated")))
+                    for r in iter_csv(path, panel.loci)]
+    isolates = list(synthetic_cohort(panel, real_records, args.isolates))
+
+    start = time.perf_counter()
+    expected = [automatizacion_rp.score_records(panel, records)[0] for _, records in isolates]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cohort = cohorte_rp.build_cohort(isolates, panel)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    matrix = cohorte_rp.score_cohort(panel, cohort)
+    score_time = time.perf_counter() - start
+
+    expected = np.array([[scores[ab] for ab in automatizacion_rp.ANTIBIOTICS] for scores in expected])
+    if not np.array_equal(expected, matrix):
+        raise SystemExit("El motor columnar no coincide con score_records()")
+
+    print(f"aislados: {args.isolates}  registros: {len(cohort.locus)}")
+    print(f"bucle por aislado:       {loop_time:.3f} s")
+    print(f"columnar (carga):        {build_time:.3f} s")
+    print(f"columnar (evaluación):   {score_time:.3f} s")
+    print(f"aceleración evaluación:  x{loop_time / score_time:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmarks de lectura, cálculo y escritura de scores sobre los ficheros reales de
+FuentesInformacion y sobre aislados y paneles sintéticos de distintos tamaños.
+
+    python benchmarks/bench_rp.py --output resultados.json
+    python benchmarks/bench_rp.py --compare resultados.json
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import automatizacion_rp
+import salida_rp
+from automatizacion_rp_launcher import DEFAULT_SCORES, isolate_name, iter_csv, load_csv, load_scores
+from compilacion_rp import compile_scores
+from sinteticos import REAL_SIZES, panel_loci, scaled_panel, synthetic_records, write_curated
+
+
+# Variación relativa a partir de la cual --compare marca una regresión
+REGRESSION_THRESHOLD = 0.2
+
+
+def measure(function, repeat):
+    """Devuelve (mejor tiempo en s, pico de memoria en bytes, último resultado) de 'function'."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def bench_case(name, scores_json, paths, repeat):
+    """Mide por separado lectura, cálculo y escritura de los aislados de 'paths'."""
+    panel = compile_scores(scores_json)
+
+    def parse_full():
+        return [load_csv(path) for path in paths]
+
+    def parse_filtered():
+        return [list(iter_csv(path, panel.loci)) for path in paths]
+
+    parse_time, parse_peak, _ = measure(parse_full, repeat)
+    stream_time, stream_peak, isolates = measure(parse_filtered, repeat)
+
+    def score():
+        return [automatizacion_rp.main(panel, records, isolate_name(path))
+                for path, records in zip(paths, isolates)]
+
+    score_time, score_peak, results = measure(score, repeat)
+
+    def output():
+        out = io.StringIO()
+        with salida_rp.JsonLinesWriter(out) as writer:
+            writer.write_all(results)
+        return out
+
+    output_time, output_peak, _ = measure(output, repeat)
+    return {
+        "case": name,
+        "isolates": len(paths),
+        "variants": sum(len(records) for records in parse_full()),
+        "panel_genes": len(panel.genes),
+        "panel_loci": len(panel.loci),
+        "parse_s": parse_time,
+        "parse_peak_bytes": parse_peak,
+        "parse_filtered_s": stream_time,
+        "parse_filtered_peak_bytes": stream_peak,
+        "score_s": score_time,
+        "score_peak_bytes": score_peak,
+        "output_s": output_time,
+        "output_peak_bytes": output_peak,
+    }
+
+
+def synthetic_files(directory, scores_json, scale, seed=0):
+    """Ficheros sintéticos con los tamaños de los aislados reales multiplicados por 'scale'."""
+    rng = random.Random(seed)
+    loci = panel_loci(scores_json)
+    paths = []
+    for isolate, size in REAL_SIZES.items():
+        path = os.path.join(directory, f"{isolate}S.snps.withoutcommon.curated")
+        write_curated(path, synthetic_records(rng, f"{isolate}S", size * scale, loci))
+        paths.append(path)
+    return paths
+
+
+def run(repeat, scales, panel_factors):
+    scores_json = load_scores(os.path.join(ROOT, DEFAULT_SCORES))
+    real_paths = sorted(glob.glob(os.path.join(ROOT, "FuentesInformacion", "*.snps.withoutcommon.curated")))
+    cases = [bench_case("real", scores_json, real_paths, repeat)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            scale_dir = os.path.join(directory, f"x{scale}")
+            os.makedirs(scale_dir)
+            paths = synthetic_files(scale_dir, scores_json, scale)
+            cases.append(bench_case(f"sintetico-x{scale}", scores_json, paths, repeat))
+
+        for factor in panel_factors:
+            big_panel = scaled_panel(scores_json, gene_factor=factor, extra_loci=factor, extra_ranges=4 * factor)
+            panel_dir = os.path.join(directory, f"panel-x{factor}")
+            os.makedirs(panel_dir)
+            paths = synthetic_files(panel_dir, big_panel, 1)
+            cases.append(bench_case(f"panel-x{factor}", big_panel, paths, repeat))
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": cases,
+    }
+
+
+def compare(current, previous):
+    """Muestra la variación de los tiempos respecto a un resultado anterior y marca las regresiones."""
+    previous_cases = {case["case"]: case for case in previous["cases"]}
+    regressions = 0
+    for case in current["cases"]:
+        before = previous_cases.get(case["case"])
+        if before is None:
+            continue
+        for metric in ("parse_s", "parse_filtered_s", "score_s", "output_s"):
+            if not before[metric]:
+                continue
+            change = case[metric] / before[metric] - 1
+            flag = ""
+            if change > REGRESSION_THRESHOLD:
+                flag = "  <-- REGRESIÓN"
+                regressions += 1
+            print(f"{case['case']:>16} {metric:>17}: {before[metric]:.4f} -> {case[metric]:.4f} s ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por medida (se toma la mejor)")
+    parser.add_argument("--scales", type=int, nargs="*", default=[1, 4], help="multiplicadores del tamaño de los aislados")
+    parser.add_argument("--panel-factors", type=int, nargs="*", default=[4], help="multiplicadores del tamaño del panel")
+    parser.add_argument("--output", help="fichero JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="resultados JSON anteriores con los que comparar")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.scales, args.panel_factors)
+    for case in results["cases"]:
+        print(f"{case['case']:>16}: {case['variants']:>7} variantes  "
+              f"lectura {case['parse_s']:.4f} s  lectura filtrada {case['parse_filtered_s']:.4f} s  "
+              f"cálculo {case['score_s']:.4f} s  salida {case['output_s']:.4f} s  "
+              f"pico cálculo {case['score_peak_bytes'] / 1024:.0f} KiB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f)):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Comprueba que el plan compilado da exactamente los mismos resultados que las
+funciones originales sobre paneles y registros aleatorios:
+  - evaluate_rule() frente a evaluate_condition() (alelos, rangos solapados, vacíos
+    o invertidos, posiciones repetidas con ceros a la izquierda, tipos de mutación);
+  - evaluate_rule_regulators() frente a evaluate_regulators();
+  - score_records() con el panel compilado frente al bucle original de main()
+    sobre el JSON, y score_panels() frente a score_records() panel a panel.
+Los valores se comparan por su repr (1 y 1.0 se escriben distinto en la salida).
+Termina con código 1 en la primera diferencia.
+
+    python benchmarks/check_equivalencia.py --rounds 2000 --seed 1
+"""
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import automatizacion_rp
+from automatizacion_rp import (ANTIBIOTICS, classify_record, evaluate_condition, evaluate_LOF,
+                               evaluate_regulators, evaluate_rule, evaluate_rule_regulators,
+                               index_records, index_variants)
+from compilacion_rp import compile_condition, compile_scores
+
+
+MUTATION_TYPES = ["LOF", "LOFN", "GOF", "GOF", "GOFO", "GOFO"]
+VALUES = [0, 1, 2, 0.25, 0.5, 1.5, 0.1, 0.3, 0.7]
+AMINO_ACIDS = ["Ser", "Ala", "Asn", "Glu", "Xxx", "*"]
+EFFECTS = ["missense_variant", "missense_variant", "stop_gained", "missense_variant&stop_retained",
+           "frameshift_indel", "missense_indel", "synonymous_variant", "start_lost"]
+MAX_POSITION = 60
+
+
+def random_alleles(rng):
+    """Alelos con posiciones sueltas, repetidas (p. ej. '7' y '07'), no numéricas y rangos."""
+    alleles = {}
+    for _ in range(rng.randint(0, 6)):
+        if rng.random() < 0.35:
+            low = rng.randint(1, MAX_POSITION)
+            # Incluye rangos vacíos o invertidos (high < low)
+            alleles[f"{low}-{low + rng.randint(-3, 12)}"] = ["Xxx"]
+        else:
+            position = str(rng.randint(1, MAX_POSITION))
+            key = rng.choice([position, position, "0" + position, "x"])
+            if rng.random() < 0.5:
+                alleles[key] = rng.choice(AMINO_ACIDS)
+            else:
+                alleles[key] = rng.sample(AMINO_ACIDS, rng.randint(1, 3))
+    return alleles
+
+
+def random_condition(rng, loci=None):
+    condition = {
+        "mutation_type": rng.choice(MUTATION_TYPES),
+        "effect": rng.choice(["+", "-"]),
+        "simple_value": rng.choice(VALUES),
+        "doble_value": rng.choice(VALUES),
+        "alleles": random_alleles(rng),
+    }
+    if loci is not None:
+        condition["regulators"] = "YES" if loci else "NO"
+        if loci:
+            condition["loci"] = {locus: random_condition(rng) for locus in loci}
+    return condition
+
+
+def random_panel(rng, n_genes=8):
+    """Panel con genes simples, claves de varios genes y sub-loci reguladores compartidos."""
+    genes = [f"PA{number:04d}" for number in range(n_genes)]
+    regulators = [f"PA{number:04d}" for number in range(100, 106)]
+    panel = {}
+    for gene in genes:
+        key = gene
+        if rng.random() < 0.2:
+            key = ",".join([gene] + [f"{gene}_{n}" for n in range(rng.randint(1, 2))])
+        panel[key] = {}
+        for ab in rng.sample(ANTIBIOTICS, rng.randint(1, len(ANTIBIOTICS))):
+            # Las claves de varios genes siempre tienen reguladores
+            loci = rng.sample(regulators, rng.randint(0 if "," not in key else 1, 3))
+            panel[key][ab] = random_condition(rng, loci)
+    return panel
+
+
+def panel_loci(panel):
+    loci = set()
+    for key, conditions in panel.items():
+        loci.update(key.split(","))
+        for condition in conditions.values():
+            loci.update(condition.get("loci", {}))
+    return sorted(loci)
+
+
+def random_record(rng, loci):
+    locus = rng.choice(loci)
+    position = rng.randint(1, MAX_POSITION)
+    return ["X", "1", "A", "T", rng.choice(EFFECTS), "M", locus, locus, "c.",
+            f"p.Ala{position}{rng.choice(AMINO_ACIDS)}", "1", "2",
+            rng.choice([str(position), str(position), "", "x"]), "3"]
+
+
+def legacy_score(scores_json, records):
+    """El bucle original de main() sobre el JSON, con las funciones sin compilar."""
+    final_scores = {ab: 0 for ab in ANTIBIOTICS}
+    final_score_eval = {ab: [] for ab in ANTIBIOTICS}
+    index = index_records(records)
+    for gene, conditions in scores_json.items():
+        if "," in gene:
+            genes = gene.split(",")
+            gene_active = not any(evaluate_LOF(record) == "LOF" for record in records if record[7] in genes)
+            if gene_active:
+                for ab, condition in conditions.items():
+                    for sub_gene in genes:
+                        score = evaluate_regulators(sub_gene, condition, index)
+                        final_scores[ab] += score
+                        final_score_eval[ab].append({sub_gene: score})
+        mutations = index.get(gene)
+        if mutations:
+            for ab, condition in conditions.items():
+                if condition.get("regulators") == "NO":
+                    for mutation in mutations:
+                        score = evaluate_condition(mutation, condition)["value"]
+                        final_scores[ab] += score
+                        final_score_eval[ab].append({gene: score})
+                elif condition.get("regulators") == "YES":
+                    score = evaluate_regulators(gene, condition, index)
+                    final_scores[ab] += score
+                    final_score_eval[ab].append({gene: score})
+    return final_scores, final_score_eval
+
+
+def check(label, expected, actual, context):
+    if repr(expected) != repr(actual):
+        raise SystemExit(f"{label}: {expected!r} != {actual!r}\n{context!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    checks = 0
+    for _ in range(args.rounds):
+        panel = random_panel(rng)
+        loci = panel_loci(panel) + ["PA9999"]
+        records = [random_record(rng, loci) for _ in range(rng.randint(0, 40))]
+        index = index_records(records)
+        variants = index_variants(records)
+
+        for _ in range(5):
+            condition = random_condition(rng)
+            rule = compile_condition(condition)
+            for record in records[:10]:
+                legacy = evaluate_condition(record, condition)
+                check("evaluate_rule", (legacy["reg_eval"], legacy["value"]),
+                      evaluate_rule(classify_record(record), rule), (condition, record))
+                checks += 1
+
+        for conditions in panel.values():
+            for condition in conditions.values():
+                if condition["regulators"] != "YES":
+                    continue
+                rule = compile_condition(condition)
+                for gene in rng.sample(loci, 3):
+                    check("evaluate_rule_regulators", evaluate_regulators(gene, condition, index),
+                          evaluate_rule_regulators(gene, rule, variants), (gene, condition, records))
+                    checks += 1
+
+        compiled = compile_scores(panel)
+        expected = legacy_score(panel, records)
+        check("score_records", expected, automatizacion_rp.score_records(compiled, records), (panel, records))
+        other = compile_scores(random_panel(rng))
+        check("score_panels", [expected, automatizacion_rp.score_records(other, records)],
+              automatizacion_rp.score_panels([compiled, other], records), (panel, records))
+        checks += 2
+
+    print(f"{checks} comparaciones idénticas ({args.rounds} paneles, semilla {args.seed})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Generadores de datos sintéticos para los benchmarks: ficheros de variantes con el
+formato .withoutcommon.curated y paneles de scores ampliados a partir de
+SCORES_100WT.json.
+"""
+import copy
+import random
+
+
+AMINO_ACIDS = ["Ala", "Arg", "Asn", "Asp", "Cys", "Gln", "Glu", "Gly", "His", "Ile",
+               "Leu", "Lys", "Met", "Phe", "Pro", "Ser", "Thr", "Trp", "Tyr", "Val"]
+EFFECTS = ["missense_variant"] * 20 + ["stop_gained", "frameshift_variant&indel", "synonymous_variant"]
+
+# Número de variantes de los ficheros reales de FuentesInformacion
+REAL_SIZES = {"PA001": 8429, "PA002": 5574, "PA008": 8642, "PA009": 4833, "PA034": 8321}
+
+# Fracción aproximada de variantes de los ficheros reales que caen en loci del panel
+PANEL_FRACTION = 0.006
+
+
+def synthetic_record(rng, isolate, locus, effect=None):
+    """Una variante aleatoria con las 14 columnas del formato curado."""
+    position = rng.randint(1, 500)
+    alt = rng.choice(AMINO_ACIDS)
+    effect = effect or rng.choice(EFFECTS)
+    return [isolate, str(rng.randint(1, 6_000_000)), "A", "T", effect, "MODERATE", locus, locus,
+            f"c.{position * 3}A>T", f"p.Ala{position}{alt}", str(position * 3), "1500",
+            str(position), "500"]
+
+
+def synthetic_records(rng, isolate, n_variants, panel_loci, panel_fraction=PANEL_FRACTION):
+    """
+    Genera n_variants registros de un aislado; una fracción 'panel_fraction' cae en
+    loci del panel y el resto en loci que el scorer no usa.
+    """
+    panel_loci = sorted(panel_loci)
+    for number in range(n_variants):
+        if rng.random() < panel_fraction:
+            yield synthetic_record(rng, isolate, rng.choice(panel_loci))
+        else:
+            yield synthetic_record(rng, isolate, f"PA{rng.randint(0, 5700):04d}X", "missense_variant")
+
+
+def write_curated(path, records):
+    """Escribe registros en un fichero .withoutcommon.curated."""
+    with open(path, "w") as f:
+        for record in records:
+            f.write(",".join(record) + "\n")
+
+
+def synthetic_cohort(panel, real_records, n_isolates, seed=0):
+    """
+    Genera n_isolates aislados (nombre, registros) a partir de registros reales de los
+    loci del panel, añadiendo mutaciones aleatorias en esos loci para cubrir todas las
+    ramas de las reglas.
+    """
+    rng = random.Random(seed)
+    loci = sorted(panel.loci)
+    for number in range(n_isolates):
+        records = rng.sample(real_records, min(len(real_records), rng.randint(10, 40)))
+        for _ in range(rng.randint(0, 8)):
+            records.append(synthetic_record(rng, f"S{number}", rng.choice(loci)))
+        yield f"S{number}", records
+
+
+def scaled_panel(scores_json, gene_factor=1, extra_loci=0, extra_ranges=0, seed=0):
+    """
+    Amplía un panel de scores: 'gene_factor' copias de cada gen con locus nuevos,
+    'extra_loci' sub-loci reguladores adicionales por condición con reguladores y
+    'extra_ranges' rangos de alelos adicionales por condición GOF/GOFO.
+    """
+    rng = random.Random(seed)
+    panel = {}
+    for copy_number in range(gene_factor):
+        for key, conditions in scores_json.items():
+            new_key = key if copy_number == 0 else ",".join(
+                f"{gene}_{copy_number}" for gene in key.split(","))
+            panel[new_key] = copy.deepcopy(conditions)
+
+    for key, conditions in panel.items():
+        for condition in conditions.values():
+            if condition.get("regulators") == "YES":
+                loci = condition.setdefault("loci", {})
+                for number in range(extra_loci):
+                    loci[f"{key.split(',')[0]}_R{number}"] = {
+                        "mutation_type": "LOF", "effect": "+", "simple_value": 0.25,
+                        "doble_value": 0.5, "alleles": {},
+                    }
+            if condition.get("mutation_type") in ("GOF", "GOFO"):
+                for _ in range(extra_ranges):
+                    low = rng.randint(1, 480)
+                    condition["alleles"][f"{low}-{low + rng.randint(1, 20)}"] = ["Xxx"]
+    return panel
+
+
+def decimal_panel(scores_json, seed=0):
+    """
+    Copia del panel con simple_value y doble_value sustituidos por decimales que no
+    son fracciones de potencias de dos (0.1, 0.3, 0.7...), para detectar diferencias
+    en el orden de las sumas.
+    """
+    rng = random.Random(seed)
+    panel = copy.deepcopy(scores_json)
+
+    def replace(condition):
+        for name in ("simple_value", "doble_value"):
+            if condition.get(name):
+                condition[name] = rng.choice([0.1, 0.3, 0.7, 1.1, 1.3, 2.7])
+        for sub_condition in condition.get("loci", {}).values():
+            replace(sub_condition)
+
+    for conditions in panel.values():
+        for condition in conditions.values():
+            replace(condition)
+    return panel
+
+
+def panel_loci(scores_json):
+    """Todos los loci de un panel (genes y sub-loci reguladores)."""
+    loci = set()
+    for key, conditions in scores_json.items():
+        loci.update(key.split(","))
+        for condition in conditions.values():
+            loci.update(condition.get("loci", {}))
+    return loci
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import time
+
+from compilacion_rp import PLAN_VERSION, default_cache_dir, file_digest
+
+
+# Tamaño máximo por defecto de la caché de resultados (bytes de resultados almacenados)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_path():
+    """Ruta por defecto de la base de datos de resultados, junto a los planes compilados."""
+    return os.path.join(default_cache_dir(), "results.sqlite")
+
+
+class ResultCache:
+    """
+    Caché local de resultados por aislado, direccionada por contenido: la clave es el
+    hash del fichero de variantes más el hash del JSON de scores (Panel.digest, junto
+    con la versión del plan compilado).
+    Guarda los totales por antibiótico y el desglose final_score_eval de
+    score_records() en una base de datos SQLite. Cuando los resultados guardados
+    superan 'max_bytes' se eliminan los de acceso más antiguo.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " variants_digest TEXT NOT NULL,"
+            " panel_digest TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (variants_digest, panel_digest))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, variants_digest, panel_digest):
+        """Devuelve (final_scores, final_score_eval) o None si no está en la caché."""
+        row = self.connection.execute(
+            "SELECT payload FROM results WHERE variants_digest = ? AND panel_digest = ?",
+            (variants_digest, panel_digest),
+        ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            "UPDATE results SET accessed = ? WHERE variants_digest = ? AND panel_digest = ?",
+            (time.time(), variants_digest, panel_digest),
+        )
+        self.connection.commit()
+        payload = json.loads(row[0])
+        return payload["scores"], payload["eval"]
+
+    def put(self, variants_digest, panel_digest, final_scores, final_score_eval):
+        """Guarda el resultado de un aislado y aplica la expulsión por tamaño."""
+        payload = json.dumps(
+            {"scores": final_scores, "eval": final_score_eval}, separators=(",", ":")
+        ).encode()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            (variants_digest, panel_digest, payload, len(payload), time.time()),
+        )
+        self.evict()
+        self.connection.commit()
+
+    def size(self):
+        """Bytes de resultados almacenados."""
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def evict(self):
+        """Elimina los resultados menos usados hasta quedar por debajo de 'max_bytes'."""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        stale = []
+        for variants_digest, panel_digest, size in self.connection.execute(
+            "SELECT variants_digest, panel_digest, size FROM results ORDER BY accessed"
+        ):
+            stale.append((variants_digest, panel_digest))
+            freed += size
+            if freed >= excess:
+                break
+        self.connection.executemany(
+            "DELETE FROM results WHERE variants_digest = ? AND panel_digest = ?", stale
+        )
+
+
+def cached_score(cache, panel, path, score):
+    """
+    Devuelve el resultado de un aislado desde la caché o, si no está, lo calcula con
+    score(path) -> (final_scores, final_score_eval) y lo guarda.
+    """
+    variants_digest = file_digest(path)
+    panel_digest = f"v{PLAN_VERSION}-{panel.digest}"
+    result = cache.get(variants_digest, panel_digest)
+    if result is None:
+        result = score(path)
+        cache.put(variants_digest, panel_digest, *result)
+    return result
@@ -0,0 +1,196 @@
+from collections import namedtuple
+
+import numpy as np
+
+from automatizacion_rp import ANTIBIOTICS, CONSEQUENCE_LOF, CONSEQUENCE_MISSENSE, classify_record
+from automatizacion_rp_launcher import isolate_name, iter_variants
+from compilacion_rp import MODE_GOF, MODE_GOFO, MODE_LOFN
+
+
+# Cohorte en formato columnar: una posición por registro (solo loci del panel).
+#   - isolates: nombres de los aislados, en orden; 'isolate' es el índice en esta lista.
+#   - loci: vocabulario de loci; 'locus' es el código de cada registro.
+#   - position: posición aminoacídica (columna 13) o -1 si no es un entero o la variante no es missense.
+#   - missense / lof: la columna 5 contiene 'missense_variant' / 'stop' o 'indel'.
+#   - alt: código del aminoácido alternativo (3 últimas letras de la columna 10) en 'alts'.
+Cohort = namedtuple(
+    "Cohort",
+    ["isolates", "loci", "alts", "isolate", "locus", "position", "missense", "lof", "alt"],
+)
+
+
+def build_cohort(isolates, panel):
+    """
+    Construye la Cohort a partir de un iterable de (nombre, registros). Los registros
+    de loci que no aparecen en el panel se descartan.
+    """
+    loci = sorted(panel.loci)
+    locus_codes = {locus: code for code, locus in enumerate(loci)}
+    alt_codes = {}
+    names = []
+    isolate, locus, position, missense, lof, alt = [], [], [], [], [], []
+    for number, (name, records) in enumerate(isolates):
+        names.append(name)
+        for record in records:
+            code = locus_codes.get(record[7])
+            if code is None:
+                continue
+            variant = classify_record(record)
+            isolate.append(number)
+            locus.append(code)
+            position.append(-1 if variant.position is None else variant.position)
+            missense.append(bool(variant.consequence & CONSEQUENCE_MISSENSE))
+            lof.append(bool(variant.consequence & CONSEQUENCE_LOF))
+            alt.append(alt_codes.setdefault(variant.alt, len(alt_codes)))
+    return Cohort(
+        isolates=names,
+        loci=loci,
+        alts=list(alt_codes),
+        isolate=np.asarray(isolate, dtype=np.int32),
+        locus=np.asarray(locus, dtype=np.int32),
+        position=np.asarray(position, dtype=np.int64),
+        missense=np.asarray(missense, dtype=bool),
+        lof=np.asarray(lof, dtype=bool),
+        alt=np.asarray(alt, dtype=np.int32),
+    )
+
+
+def load_cohort(paths, panel, fmt="auto"):
+    """Carga una cohorte de ficheros de variantes (curados o snps.csv de snippy) en formato columnar."""
+    isolates = ((isolate_name(path), iter_variants(path, panel.loci, fmt)) for path in paths)
+    return build_cohort(isolates, panel)
+
+
+def _alt_mask(cohort, rows, values):
+    codes = [code for code, aa in enumerate(cohort.alts) if aa in values]
+    return np.isin(cohort.alt[rows], codes)
+
+
+def rule_values(cohort, rule, rows):
+    """
+    Evalúa una regla compilada sobre los registros 'rows' de la cohorte a la vez.
+    Devuelve (reg_eval, value): máscara booleana y valor por registro, con el mismo
+    resultado que evaluate_rule() registro a registro.
+    """
+    n = len(rows)
+    mode = rule.mode
+    if mode == MODE_LOFN:
+        return np.ones(n, dtype=bool), np.full(n, rule.doble_value, dtype=np.float64)
+    if mode != MODE_GOF and mode != MODE_GOFO:
+        return np.zeros(n, dtype=bool), np.zeros(n, dtype=np.float64)
+
+    # Equivalente vectorizado de match_alleles()
+    position = cohort.position[rows]
+    candidate = cohort.missense[rows] & (position >= 0)
+    no_lof = ~cohort.lof[rows]
+    if rule.any_allele:
+        double = candidate & no_lof
+    else:
+        double = np.zeros(n, dtype=bool)
+        listed = np.zeros(n, dtype=bool)
+        for expected, (any_aa, values) in rule.positions.items():
+            at = candidate & (position == expected)
+            listed |= at
+            match = _alt_mask(cohort, rows, values)
+            if any_aa:
+                match |= no_lof
+            double |= at & match
+        in_range = np.zeros(n, dtype=bool)
+        for low, high in rule.ranges:
+            in_range |= (position >= low) & (position <= high)
+        double |= candidate & ~listed & in_range
+
+    if mode == MODE_GOF:
+        return np.ones(n, dtype=bool), np.where(double, rule.doble_value, rule.simple_value)
+    return double, np.where(double, rule.doble_value, 0.0)
+
+
+def locus_rows(cohort):
+    """
+    Agrupa los registros por locus: devuelve locus -> índices de sus registros, en el
+    orden original (ordenados por aislado). Equivale a index_records() para la cohorte.
+    """
+    order = np.argsort(cohort.locus, kind="stable")
+    bounds = np.searchsorted(cohort.locus[order], np.arange(len(cohort.loci) + 1))
+    return {locus: order[bounds[code]:bounds[code + 1]] for code, locus in enumerate(cohort.loci)}
+
+
+class _CohortEvaluator:
+    """Evalúa reglas sobre la cohorte reutilizando los resultados por (regla, locus)."""
+
+    def __init__(self, cohort):
+        self.cohort = cohort
+        self.rows = locus_rows(cohort)
+        self.empty = np.zeros(0, dtype=np.intp)
+        self.evaluated = {}
+
+    def locus(self, locus):
+        return self.rows.get(locus, self.empty)
+
+    def evaluate(self, rule, locus):
+        key = (id(rule), locus)
+        if key not in self.evaluated:
+            self.evaluated[key] = rule_values(self.cohort, rule, self.locus(locus))
+        return self.evaluated[key]
+
+    def sum_by_isolate(self, locus, values):
+        # bincount acumula en el orden de los registros, como el bucle de evaluate_rule_regulators()
+        return np.bincount(self.cohort.isolate[self.locus(locus)], weights=values,
+                           minlength=len(self.cohort.isolates))
+
+    def regulators(self, gene, rule):
+        """
+        Equivalente vectorizado de evaluate_rule_regulators(): score del gen principal más
+        el valor del primer registro de los sub-loci (en orden) que cumple su condición.
+        """
+        n_isolates = len(self.cohort.isolates)
+        regulator_value = np.zeros(n_isolates, dtype=np.float64)
+        passed = np.zeros(n_isolates, dtype=bool)
+        for locus, sub_rule in rule.loci:
+            reg_eval, value = self.evaluate(sub_rule, locus)
+            hits = np.flatnonzero(reg_eval)
+            # Los registros están ordenados por aislado, así que el primer índice es el primer registro que cumple
+            isolates, first = np.unique(self.cohort.isolate[self.locus(locus)[hits]], return_index=True)
+            new = ~passed[isolates]
+            regulator_value[isolates[new]] = value[hits[first[new]]]
+            passed[isolates] = True
+
+        _, value = self.evaluate(rule, gene)
+        return self.sum_by_isolate(gene, value) + regulator_value
+
+
+def score_cohort(panel, cohort):
+    """
+    Calcula la matriz de scores aislados x antibióticos (columnas en el orden de
+    ANTIBIOTICS) de toda la cohorte, con los mismos resultados que score_records().
+    """
+    n_isolates = len(cohort.isolates)
+    scores = np.zeros((n_isolates, len(ANTIBIOTICS)), dtype=np.float64)
+    evaluator = _CohortEvaluator(cohort)
+
+    for entry in panel.genes:
+        if entry.multi:
+            active = np.ones(n_isolates, dtype=bool)
+            for sub_gene in entry.genes:
+                rows = evaluator.locus(sub_gene)
+                active[cohort.isolate[rows[cohort.lof[rows]]]] = False
+            for ab, rule in entry.rules:
+                column = ANTIBIOTICS.index(ab)
+                for sub_gene in entry.genes:
+                    scores[:, column] += np.where(active, evaluator.regulators(sub_gene, rule), 0)
+
+        rows = evaluator.locus(entry.key)
+        if not len(rows):
+            continue
+        has_gene = np.zeros(n_isolates, dtype=bool)
+        has_gene[cohort.isolate[rows]] = True
+        for ab, rule in entry.rules:
+            column = ANTIBIOTICS.index(ab)
+            if rule.regulators == "NO":
+                _, value = evaluator.evaluate(rule, entry.key)
+                # score_records() suma registro a registro: np.add.at acumula en ese mismo orden
+                np.add.at(scores, (cohort.isolate[rows], column), value)
+            elif rule.regulators == "YES":
+                scores[:, column] += np.where(has_gene, evaluator.regulators(entry.key, rule), 0)
+
+    return scores
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import namedtuple
+
+
+# Versión del formato del plan compilado; forma parte de la clave de la caché en disco
+PLAN_VERSION = 2
+
+# Modos de evaluación precalculados a partir de 'mutation_type'
+MODE_LOF = 0
+MODE_LOFN = 1
+MODE_GOF = 2
+MODE_GOFO = 3
+MODE_UNKNOWN = 4
+
+MODES = {"LOF": MODE_LOF, "LOFN": MODE_LOFN, "GOF": MODE_GOF, "GOFO": MODE_GOFO}
+
+# Regla compilada para una condición (gen principal o sublocus regulador):
+#   - mode: modo de evaluación (MODE_*).
+#   - simple_value / doble_value: valores ya multiplicados por el signo del efecto.
+#   - constant: resultado (reg_eval, value) fijo para los modos que no dependen del registro.
+#   - any_allele: True si 'alleles' está vacío (vale cualquier mutación missense).
+#   - positions: posición -> (acepta 'Xxx', frozenset de aminoácidos esperados).
+#   - ranges: índice de intervalos de las claves tipo "80-93": intervalos disjuntos y
+#     ordenados (los solapados o contiguos se fusionan, ya que todos dan "double").
+#   - range_starts: inicio de cada intervalo de 'ranges', para la búsqueda binaria.
+#   - regulators: valor original del campo 'regulators' ("YES"/"NO"/None).
+#   - loci: tupla de (locus, Rule) de los sub-loci reguladores, en el orden del JSON.
+Rule = namedtuple(
+    "Rule",
+    ["mutation_type", "mode", "simple_value", "doble_value", "constant",
+     "any_allele", "positions", "ranges", "range_starts", "regulators", "loci"],
+)
+
+# Entrada del panel: clave original del JSON, genes que la componen (varios si la clave
+# contiene comas) y tupla de (antibiótico, Rule) en el orden del JSON.
+GeneEntry = namedtuple("GeneEntry", ["key", "genes", "multi", "rules"])
+
+# Plan completo: hash del JSON de origen, entradas por gen y conjunto de todos los loci
+# que intervienen en alguna regla (genes principales y sub-loci reguladores).
+Panel = namedtuple("Panel", ["digest", "genes", "loci"])
+
+
+def effect_sign(effect):
+    """Convierte el signo de efecto a un multiplicador (+ -> 1, - -> -1)."""
+    return 1 if effect == "+" else -1
+
+
+def compile_alleles(alleles):
+    """
+    Convierte el diccionario 'alleles' en una tabla de posiciones exactas y una lista
+    ordenada de intervalos, conservando la precedencia que tiene evaluate_GOF() al
+    recorrer las claves en orden: una posición exacta que ya está cubierta por un
+    intervalo anterior se descarta (el intervalo responde antes), y las claves que no
+    se pueden convertir a entero se ignoran igual que en evaluate_GOF().
+    """
+    positions = {}
+    ranges = []
+    for key, aa in alleles.items():
+        try:
+            if '-' in key:
+                keys = key.split('-')
+                ranges.append((int(keys[0]), int(keys[1])))
+            else:
+                position = int(key)
+                if position in positions or any(low <= position <= high for low, high in ranges):
+                    continue
+                values = aa if isinstance(aa, list) else [aa]
+                positions[position] = ('Xxx' in values, frozenset(values))
+        except ValueError:
+            continue
+    return positions, merge_ranges(ranges)
+
+
+def merge_ranges(ranges):
+    """
+    Fusiona los intervalos (inicio, fin) solapados o contiguos en una tupla de intervalos
+    disjuntos y ordenados; los intervalos vacíos (inicio > fin) se descartan porque
+    evaluate_GOF() nunca los cumple.
+    """
+    merged = []
+    for low, high in sorted(ranges):
+        if low > high:
+            continue
+        if merged and low <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], high))
+        else:
+            merged.append((low, high))
+    return tuple(merged)
+
+
+def compile_condition(condition):
+    """Compila una condición del JSON (con sus posibles sub-loci) en una Rule inmutable."""
+    mut_type = condition.get("mutation_type")
+    mode = MODES.get(mut_type, MODE_UNKNOWN)
+    sign = effect_sign(condition.get("effect"))
+    simple_value = sign * condition["simple_value"] if "simple_value" in condition else 0
+    doble_value = sign * condition["doble_value"] if "doble_value" in condition else 0
+
+    # evaluate_condition() compara la propia función evaluate_LOF (no su resultado) con
+    # 'LOF'/'SNP', así que esas ramas nunca se cumplen: LOF siempre suma 0 y LOFN siempre
+    # suma doble_value. El plan conserva ese comportamiento como resultado constante.
+    if mode == MODE_LOF:
+        constant = (0, 0)
+    elif mode == MODE_LOFN:
+        constant = (1, doble_value)
+    else:
+        constant = None
+
+    alleles = condition.get("alleles") or {}
+    positions, ranges = compile_alleles(alleles)
+    loci = tuple(
+        (locus, compile_condition(sub_condition))
+        for locus, sub_condition in condition.get("loci", {}).items()
+    )
+    return Rule(
+        mutation_type=mut_type,
+        mode=mode,
+        simple_value=simple_value,
+        doble_value=doble_value,
+        constant=constant,
+        any_allele=not bool(alleles),
+        positions=positions,
+        ranges=ranges,
+        range_starts=tuple(low for low, _ in ranges),
+        regulators=condition.get("regulators"),
+        loci=loci,
+    )
+
+
+def compile_scores(scores_json, digest=None):
+    """Compila el diccionario cargado de SCORES_100WT.json en un Panel."""
+    genes = []
+    loci = set()
+    for key, conditions in scores_json.items():
+        key_genes = tuple(key.split(',')) if ',' in key else (key,)
+        rules = tuple((ab, compile_condition(cond)) for ab, cond in conditions.items())
+        genes.append(GeneEntry(key=key, genes=key_genes, multi=',' in key, rules=rules))
+        loci.update(key_genes)
+        for _, rule in rules:
+            loci.update(locus for locus, _ in rule.loci)
+    return Panel(digest=digest, genes=tuple(genes), loci=frozenset(loci))
+
+
+def default_cache_dir():
+    """Directorio de la caché de planes compilados (configurable con RP_CACHE_DIR)."""
+    return os.environ.get(
+        "RP_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "amr_prediction_scores"),
+    )
+
+
+def file_digest(path):
+    """Hash SHA-256 del contenido de un fichero."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def read_cached_panel(cache_file):
+    """Devuelve el Panel guardado en 'cache_file' o None si no existe o no es válido."""
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def write_cached_panel(cache_file, panel):
+    """Guarda el Panel en 'cache_file' de forma atómica."""
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(panel, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        # Si la caché no es escribible se sigue con el plan en memoria
+        pass
+
+
+def load_compiled_scores(json_file, cache_dir=None):
+    """
+    Devuelve el Panel compilado de un JSON de scores. El plan se guarda en disco
+    (pickle) con el hash del JSON como clave, de modo que solo se vuelve a compilar
+    cuando cambia el contenido del fichero.
+    """
+    with open(json_file, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    cache_dir = cache_dir or default_cache_dir()
+    cache_file = os.path.join(cache_dir, f"panel-v{PLAN_VERSION}-{digest}.pickle")
+    panel = read_cached_panel(cache_file)
+    if panel is None:
+        panel = compile_scores(json.loads(raw), digest=digest)
+        write_cached_panel(cache_file, panel)
+    return panel
+
+
+def load_panel(scores_file, cache_dir=None):
+    """Panel compilado de un JSON de scores o, si la extensión es .xlsx, del Excel de scores."""
+    if scores_file.lower().endswith(".xlsx"):
+        from panel_excel_rp import load_compiled_excel
+        return load_compiled_excel(scores_file, cache_dir)
+    return load_compiled_scores(scores_file, cache_dir)
+
+
+if __name__ == "__main__":
+    # Precompila los paneles en la caché antes de lanzar muchas tareas cortas:
+    #   python compilacion_rp.py SCORES_100WT.json [SCORES.xlsx ...]
+    import sys
+
+    for scores_file in sys.argv[1:]:
+        panel = load_panel(scores_file)
+        print(f"{scores_file}: {len(panel.genes)} genes, {len(panel.loci)} loci, plan {panel.digest}")
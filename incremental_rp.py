@@ -0,0 +1,222 @@
+import argparse
+import json
+import sqlite3
+import sys
+
+from automatizacion_rp import ANTIBIOTICS, IsolateResult, index_variants, score_gene
+from automatizacion_rp_launcher import DEFAULT_SCORES, collect_inputs, isolate_name, iter_variants
+from salida_rp import CsvWriter
+from compilacion_rp import compile_scores, file_digest
+
+
+def entry_loci(entry):
+    """Loci cuyos registros intervienen en una entrada del panel (genes y sub-loci reguladores)."""
+    loci = set(entry.genes)
+    loci.add(entry.key)
+    for _, rule in entry.rules:
+        loci.update(locus for locus, _ in rule.loci)
+    return loci
+
+
+def diff_panels(old_json, new_json):
+    """
+    Compara dos versiones del JSON de scores. Devuelve (changed_keys, changed_loci):
+    las claves de gen añadidas, eliminadas o modificadas y, dentro de ellas, los loci
+    reguladores ('loci') cuya condición ha cambiado.
+    """
+    changed_keys = set()
+    changed_loci = set()
+    for key in set(old_json) | set(new_json):
+        old_entry = old_json.get(key)
+        new_entry = new_json.get(key)
+        if _canonical(old_entry) == _canonical(new_entry):
+            continue
+        changed_keys.add(key)
+        for ab in set(old_entry or {}) | set(new_entry or {}):
+            old_loci = (old_entry or {}).get(ab, {}).get("loci", {})
+            new_loci = (new_entry or {}).get(ab, {}).get("loci", {})
+            for locus in set(old_loci) | set(new_loci):
+                if _canonical(old_loci.get(locus)) != _canonical(new_loci.get(locus)):
+                    changed_loci.add(locus)
+    return changed_keys, changed_loci
+
+
+def _canonical(value):
+    # Se conserva el orden de las claves: el orden de los sub-loci influye en la evaluación
+    return json.dumps(value)
+
+
+class ContributionStore:
+    """
+    Almacén SQLite de las contribuciones por aislado, clave de gen del panel y
+    antibiótico (lo que score_records() acumula en final_score_eval), junto con el
+    JSON de scores con el que se calcularon. Permite recalcular únicamente las
+    claves de gen que cambian entre dos versiones del panel.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS isolates ("
+            " isolate TEXT PRIMARY KEY, path TEXT NOT NULL, digest TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS contributions ("
+            " isolate TEXT NOT NULL, gene_key TEXT NOT NULL, seq INTEGER NOT NULL,"
+            " ab TEXT NOT NULL, locus TEXT NOT NULL, score NOT NULL,"
+            " PRIMARY KEY (isolate, gene_key, seq));"
+            "CREATE TABLE IF NOT EXISTS totals ("
+            " isolate TEXT NOT NULL, ab TEXT NOT NULL, score NOT NULL,"
+            " PRIMARY KEY (isolate, ab));"
+        )
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def panel_json(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE name = 'panel'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def isolates(self):
+        return self.connection.execute("SELECT isolate, path, digest FROM isolates ORDER BY isolate").fetchall()
+
+    def _store_entry(self, isolate, entry, index):
+        rows = [(isolate, entry.key, seq, ab, locus, score)
+                for seq, (ab, locus, score) in enumerate(score_gene(entry, index))]
+        self.connection.executemany("INSERT INTO contributions VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def _update_totals(self, isolate, key_order):
+        """Recalcula los totales sumando las contribuciones en el orden de score_records()."""
+        rows = self.connection.execute(
+            "SELECT gene_key, seq, ab, score FROM contributions WHERE isolate = ?", (isolate,)
+        ).fetchall()
+        # Las claves que ya no están en el panel no cuentan
+        rows = sorted((row for row in rows if row[0] in key_order), key=lambda row: (key_order[row[0]], row[1]))
+        totals = {ab: 0 for ab in ANTIBIOTICS}
+        for _, _, ab, score in rows:
+            totals[ab] += score
+        self.connection.execute("DELETE FROM totals WHERE isolate = ?", (isolate,))
+        self.connection.executemany(
+            "INSERT INTO totals VALUES (?, ?, ?)", [(isolate, ab, score) for ab, score in totals.items()]
+        )
+
+    def _score_isolate(self, isolate, path, digest, panel, entries, fmt):
+        """Recalcula las contribuciones de 'entries' leyendo solo los loci que las afectan."""
+        loci = set()
+        for entry in entries:
+            loci |= entry_loci(entry)
+        index = index_variants(iter_variants(path, loci, fmt))
+        keys = [entry.key for entry in entries]
+        self.connection.executemany(
+            "DELETE FROM contributions WHERE isolate = ? AND gene_key = ?", [(isolate, key) for key in keys]
+        )
+        for entry in entries:
+            self._store_entry(isolate, entry, index)
+        self.connection.execute("INSERT OR REPLACE INTO isolates VALUES (?, ?, ?)", (isolate, path, digest))
+        self._update_totals(isolate, {entry.key: order for order, entry in enumerate(panel.genes)})
+
+    def build(self, scores_json, paths, fmt="auto"):
+        """
+        Puntúa por completo los aislados de 'paths' con el panel indicado y guarda sus
+        contribuciones. Si el almacén ya tenía otro panel, los aislados que no están en
+        'paths' se vuelven a puntuar también con el panel nuevo.
+        """
+        panel = compile_scores(scores_json)
+        old_json = self.panel_json()
+        targets = {isolate_name(path): path for path in paths}
+        if old_json is not None and _canonical(old_json) != _canonical(scores_json):
+            for isolate, path, _ in self.isolates():
+                targets.setdefault(isolate, path)
+        for isolate, path in targets.items():
+            self.connection.execute("DELETE FROM contributions WHERE isolate = ?", (isolate,))
+            self._score_isolate(isolate, path, file_digest(path), panel, panel.genes, fmt)
+        self._save_panel(scores_json)
+        self.connection.commit()
+
+    def update(self, scores_json, fmt="auto"):
+        """
+        Aplica una nueva versión del panel: solo se recalculan las claves de gen que han
+        cambiado (y los aislados completos cuyo fichero de variantes ha cambiado).
+        Devuelve (changed_keys, changed_loci) de diff_panels().
+        """
+        old_json = self.panel_json()
+        if old_json is None:
+            raise ValueError("El almacén no tiene ningún panel; ejecuta antes build()")
+        changed_keys, changed_loci = diff_panels(old_json, scores_json)
+        panel = compile_scores(scores_json)
+        changed_entries = [entry for entry in panel.genes if entry.key in changed_keys]
+        removed = [key for key in changed_keys if key not in scores_json]
+
+        for isolate, path, digest in self.isolates():
+            current = file_digest(path)
+            if current != digest:
+                self.connection.execute("DELETE FROM contributions WHERE isolate = ?", (isolate,))
+                self._score_isolate(isolate, path, current, panel, panel.genes, fmt)
+            elif changed_keys:
+                self.connection.executemany(
+                    "DELETE FROM contributions WHERE isolate = ? AND gene_key = ?",
+                    [(isolate, key) for key in removed],
+                )
+                self._score_isolate(isolate, path, digest, panel, changed_entries, fmt)
+        self._save_panel(scores_json)
+        self.connection.commit()
+        return changed_keys, changed_loci
+
+    def _save_panel(self, scores_json):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('panel', ?)", (json.dumps(scores_json),)
+        )
+
+    def result(self, isolate):
+        """Devuelve (final_scores, final_score_eval) de un aislado, igual que score_records()."""
+        key_order = {key: order for order, key in enumerate(self.panel_json())}
+        rows = self.connection.execute(
+            "SELECT gene_key, seq, ab, locus, score FROM contributions WHERE isolate = ?", (isolate,)
+        ).fetchall()
+        rows = sorted((row for row in rows if row[0] in key_order), key=lambda row: (key_order[row[0]], row[1]))
+        final_scores = {ab: 0 for ab in ANTIBIOTICS}
+        final_score_eval = {ab: [] for ab in ANTIBIOTICS}
+        for _, _, ab, locus, score in rows:
+            final_scores[ab] += score
+            final_score_eval[ab].append({locus: score})
+        return final_scores, final_score_eval
+
+    def totals(self):
+        """Genera un IsolateResult (sin desglose) por cada aislado del almacén."""
+        scores = {}
+        for isolate, ab, score in self.connection.execute("SELECT isolate, ab, score FROM totals"):
+            scores.setdefault(isolate, {})[ab] = score
+        for isolate, _, _ in self.isolates():
+            yield IsolateResult(isolate, scores.get(isolate, {ab: 0 for ab in ANTIBIOTICS}), None)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Almacén de contribuciones y recálculo incremental de scores.")
+    parser.add_argument("command", choices=["build", "update", "table"])
+    parser.add_argument("--store", required=True, help="base de datos SQLite de contribuciones")
+    parser.add_argument("--scores", default=DEFAULT_SCORES, help="JSON de scores (por defecto %(default)s)")
+    parser.add_argument("--dir", help="directorio con ficheros *.snps.withoutcommon.curated (build)")
+    parser.add_argument("--glob", help="patrón glob de ficheros de variantes (build)")
+    parser.add_argument("--manifest", help="fichero con una ruta de variantes por línea (build)")
+    parser.add_argument("--format", choices=["auto", "curated", "snippy"], default="auto")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with ContributionStore(args.store) as store:
+        if args.command == "build":
+            with open(args.scores) as f:
+                store.build(json.load(f), collect_inputs(args.dir, args.glob, args.manifest), args.format)
+        elif args.command == "update":
+            with open(args.scores) as f:
+                changed_keys, changed_loci = store.update(json.load(f), args.format)
+            print(f"Claves recalculadas: {sorted(changed_keys)}", file=sys.stderr)
+            print(f"Loci reguladores modificados: {sorted(changed_loci)}", file=sys.stderr)
+        with CsvWriter(sys.stdout) as writer:
+            writer.write_all(store.totals())
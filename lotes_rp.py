@@ -0,0 +1,106 @@
+"""
+Cálculo de scores de una cohorte repartida en lotes (shards), pensado para el
+workflow de Nextflow (main.nf):
+
+    python lotes_rp.py split cohorte.txt --shards 8          # shard_000.txt ... shard_007.txt
+    python lotes_rp.py score shard_000.txt --output shard_000.csv
+    python lotes_rp.py merge --output cohorte.csv shard_*.csv
+
+Cada lote se puntúa en un único proceso que carga el panel una sola vez y recorre
+todos sus aislados; 'merge' une las tablas de los lotes en el orden del manifiesto.
+"""
+import argparse
+import os
+
+import automatizacion_rp
+import salida_rp
+from automatizacion_rp_launcher import DEFAULT_SCORES, FORMATS, collect_inputs, isolate_name, iter_variants
+from compilacion_rp import load_panel
+
+
+def split_manifest(manifest, shards, prefix="shard_"):
+    """
+    Reparte las rutas del manifiesto en 'shards' lotes consecutivos del mismo tamaño
+    (como máximo) y escribe un manifiesto por lote con rutas absolutas. Devuelve la
+    lista de ficheros escritos.
+    """
+    # realpath: el manifiesto puede ser un enlace (p. ej. en el directorio de trabajo de
+    # Nextflow) y las rutas relativas se resuelven respecto al fichero original
+    paths = [os.path.abspath(path) for path in collect_inputs(manifest=os.path.realpath(manifest))]
+    shards = max(1, min(shards, len(paths)))
+    size, extra = divmod(len(paths), shards)
+    written = []
+    start = 0
+    for number in range(shards):
+        end = start + size + (1 if number < extra else 0)
+        shard_file = f"{prefix}{number:03d}.txt"
+        with open(shard_file, "w") as f:
+            f.writelines(f"{path}\n" for path in paths[start:end])
+        written.append(shard_file)
+        start = end
+    return written
+
+
+def score_shard(paths, scores_file=DEFAULT_SCORES, fmt="auto"):
+    """Puntúa en este proceso todos los aislados de 'paths'; genera un IsolateResult por aislado."""
+    panel = load_panel(scores_file)
+    for path in paths:
+        records = iter_variants(path, panel.loci, fmt)
+        final_scores, final_score_eval = automatizacion_rp.score_records(panel, records)
+        yield automatizacion_rp.IsolateResult(isolate_name(path), final_scores, final_score_eval)
+
+
+def merge_shards(paths, out):
+    """
+    Une las salidas CSV o JSON Lines de los lotes en 'out', ordenadas por nombre de
+    fichero (el de sus lotes). De las tablas CSV solo se conserva la primera cabecera.
+    """
+    header = None
+    with open(out, "w", newline="") as target:
+        for path in sorted(paths):
+            with open(path, newline="") as f:
+                first = f.readline()
+                if first.startswith("ISOLATE,"):
+                    if header is None:
+                        header = first
+                        target.write(first)
+                else:
+                    target.write(first)
+                for line in f:
+                    target.write(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cálculo de scores por lotes (split / score / merge).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    split = commands.add_parser("split", help="repartir un manifiesto en lotes")
+    split.add_argument("manifest", help="fichero con una ruta de variantes por línea")
+    split.add_argument("--shards", type=int, required=True, help="número de lotes")
+    split.add_argument("--prefix", default="shard_", help="prefijo de los manifiestos de cada lote")
+
+    score = commands.add_parser("score", help="puntuar los aislados de un lote en un único proceso")
+    score.add_argument("shard", help="manifiesto del lote")
+    score.add_argument("--scores", default=DEFAULT_SCORES, help="JSON o Excel (.xlsx) de scores (por defecto %(default)s)")
+    score.add_argument("--format", choices=FORMATS, default="auto", help="formato de las variantes")
+    score.add_argument("--output", help="fichero de salida (por defecto, salida estándar)")
+    score.add_argument("--output-format", choices=["csv", "jsonl"], default="csv")
+
+    merge = commands.add_parser("merge", help="unir las salidas de los lotes en una tabla de la cohorte")
+    merge.add_argument("--output", required=True, help="tabla de la cohorte")
+    merge.add_argument("parts", nargs="+", help="salidas de los lotes (CSV o JSON Lines)")
+
+    args = parser.parse_args(argv)
+    if args.command == "split":
+        for shard_file in split_manifest(args.manifest, args.shards, args.prefix):
+            print(shard_file)
+    elif args.command == "score":
+        paths = collect_inputs(manifest=args.shard)
+        with salida_rp.open_writer(args.output_format, args.output) as writer:
+            writer.write_all(score_shard(paths, args.scores, args.format))
+    else:
+        merge_shards(args.parts, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env nextflow
+/*
+ * Cálculo de scores de resistencia de una cohorte por lotes:
+ *   SPLIT  reparte el manifiesto en params.shards lotes,
+ *   SCORE  puntúa cada lote en un único proceso de Python (el panel se carga una vez),
+ *   MERGE  une las tablas de los lotes en la tabla de la cohorte.
+ *
+ *   ./nextflow run main.nf --manifest cohorte.txt --shards 8
+ *
+ * Las rutas de variantes del manifiesto se pasan como rutas absolutas (no se copian
+ * al directorio de trabajo), así que deben ser visibles desde todos los nodos.
+ */
+nextflow.enable.dsl = 2
+
+process SPLIT {
+    input:
+    path manifest
+
+    output:
+    path 'shard_*.txt'
+
+    script:
+    """
+    python ${projectDir}/lotes_rp.py split ${manifest} --shards ${params.shards}
+    """
+}
+
+process SCORE {
+    tag "${shard.baseName}"
+
+    input:
+    path shard
+    path scores
+
+    output:
+    path "${shard.baseName}.${params.output_format}"
+
+    script:
+    """
+    python ${projectDir}/lotes_rp.py score ${shard} --scores ${scores} --format ${params.format} \\
+        --output ${shard.baseName}.${params.output_format} --output-format ${params.output_format}
+    """
+}
+
+process MERGE {
+    publishDir params.outdir, mode: 'copy'
+
+    input:
+    path parts
+
+    output:
+    path "cohorte.${params.output_format}"
+
+    script:
+    """
+    python ${projectDir}/lotes_rp.py merge --output cohorte.${params.output_format} ${parts}
+    """
+}
+
+workflow {
+    if (!params.manifest) {
+        error "Falta --manifest (fichero con una ruta de variantes por línea)"
+    }
+    shards = SPLIT(file(params.manifest, checkIfExists: true)).flatten()
+    scores = file(params.scores, checkIfExists: true)
+    MERGE(SCORE(shards, scores).collect())
+}
@@ -0,0 +1,271 @@
+"""
+Lectura directa de los Excel de scores (SCORES_100WT*.xlsx) sin pandas.
+
+Se lee la pestaña SCORES con zipfile/ElementTree y se convierte en el mismo
+diccionario de reglas que SCORES_100WT.json:
+  - VALUE "x/y" -> doble_value x, simple_value y (un solo valor se usa para ambos);
+    el signo se toma de EFFECT y se aceptan comas decimales.
+  - TYPE OF MUTATION "Loss of function" -> LOF; "Gain of function" -> GOFO si
+    OBSERVACIONES solo lista posiciones o rangos (vale cualquier aminoácido) y GOF
+    si lista mutaciones concretas (L14Q -> "14": "Gln") o no lista nada.
+  - Las pestañas de grupo (SCORES_MEX_R_S, SCORES_MEX_S, SCORES_AMPc, SCORES_NFXB)
+    definen los reguladores: los genes con EFFECT "-" (bombas) o, si no los hay,
+    los marcados con '*' son los genes principales y el resto sus reguladores
+    ('loci') para cada antibiótico. Las bombas sin VALUE se agrupan en una clave
+    con varios genes ("PA2493,PA2494,PA2495") de tipo LOFN.
+Si el libro no tiene pestañas de grupo todas las reglas quedan sin reguladores.
+"""
+import json
+import os
+import re
+import sys
+
+from compilacion_rp import (PLAN_VERSION, compile_scores, default_cache_dir, file_digest,
+                            read_cached_panel, write_cached_panel)
+
+
+SCORES_SHEET = "SCORES"
+GROUP_SHEETS = ("SCORES_MEX_R_S", "SCORES_MEX_S", "SCORES_AMPc", "SCORES_NFXB")
+COLUMNS = ("LOCUS", "GENE", "ANTIBIOTIC", "EFFECT", "VALUE", "TYPE OF MUTATION", "OBSERVACIONES")
+
+AMINO_ACIDS = {
+    "A": "Ala", "R": "Arg", "N": "Asn", "D": "Asp", "C": "Cys", "Q": "Gln", "E": "Glu",
+    "G": "Gly", "H": "His", "I": "Ile", "L": "Leu", "K": "Lys", "M": "Met", "F": "Phe",
+    "P": "Pro", "S": "Ser", "T": "Thr", "W": "Trp", "Y": "Tyr", "V": "Val",
+}
+
+MUTATION = re.compile(r"\b([A-Z])(\d+)([A-Z])\b")
+RANGE = re.compile(r"\b(\d+)\s*-\s*(\d+)\b")
+POSITION = re.compile(r"\b(\d+)\b")
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_CELL_COLUMN = re.compile(r"[A-Z]+")
+
+
+def read_sheets(xlsx_file, names):
+    """
+    Devuelve {pestaña: filas} de las pestañas pedidas que existan en el libro. Cada
+    fila es un diccionario columna ('A', 'B', ...) -> texto de la celda.
+    """
+    import zipfile
+    from xml.etree import ElementTree
+
+    with zipfile.ZipFile(xlsx_file) as book:
+        members = set(book.namelist())
+        shared = []
+        if "xl/sharedStrings.xml" in members:
+            for item in ElementTree.fromstring(book.read("xl/sharedStrings.xml")).iter(f"{_MAIN_NS}si"):
+                shared.append("".join(text.text or "" for text in item.iter(f"{_MAIN_NS}t")))
+
+        relations = ElementTree.fromstring(book.read("xl/_rels/workbook.xml.rels"))
+        targets = {relation.get("Id"): relation.get("Target") for relation in relations}
+        workbook = ElementTree.fromstring(book.read("xl/workbook.xml"))
+
+        sheets = {}
+        for sheet in workbook.iter(f"{_MAIN_NS}sheet"):
+            name = sheet.get("name")
+            if name not in names:
+                continue
+            target = targets[sheet.get(f"{_REL_NS}id")].lstrip("/")
+            if not target.startswith("xl/"):
+                target = f"xl/{target}"
+            rows = []
+            for row in ElementTree.fromstring(book.read(target)).iter(f"{_MAIN_NS}row"):
+                cells = {}
+                for cell in row.iter(f"{_MAIN_NS}c"):
+                    column = _CELL_COLUMN.match(cell.get("r")).group()
+                    kind = cell.get("t")
+                    value = cell.find(f"{_MAIN_NS}v")
+                    if kind == "s":
+                        text = shared[int(value.text)]
+                    elif kind == "inlineStr":
+                        text = "".join(t.text or "" for t in cell.iter(f"{_MAIN_NS}t"))
+                    else:
+                        text = value.text if value is not None else ""
+                    cells[column] = (text or "").strip()
+                rows.append(cells)
+            sheets[name] = rows
+    return sheets
+
+
+def table_rows(rows):
+    """Convierte las filas de una pestaña en diccionarios por nombre de columna (cabecera en la primera fila)."""
+    if not rows:
+        return []
+    header = {column: rows[0][column] for column in rows[0] if rows[0][column] in COLUMNS}
+    table = []
+    for row in rows[1:]:
+        item = {name: row.get(column, "") for column, name in header.items()}
+        if item.get("LOCUS", "").startswith("PA") and item.get("ANTIBIOTIC"):
+            table.append(item)
+    return table
+
+
+def parse_number(text):
+    """Valor absoluto de un número con coma o punto decimal (el signo lo da EFFECT)."""
+    return abs(float(text.strip().replace(",", ".")))
+
+
+def parse_values(text):
+    """Devuelve (simple_value, doble_value) a partir de VALUE ("x/y" o un único valor)."""
+    text = text.strip()
+    if not text:
+        return 0, 0
+    parts = text.split("/")
+    doble = parse_number(parts[0])
+    simple = parse_number(parts[1]) if len(parts) > 1 and parts[1].strip() else doble
+    return simple, doble
+
+
+def parse_alleles(observations):
+    """
+    Extrae los alelos de OBSERVACIONES. Devuelve (alleles, specific): 'specific' es
+    True si se listan mutaciones concretas (p. ej. L14Q) y False si solo posiciones
+    o rangos, en cuyo caso vale cualquier aminoácido ('Xxx').
+    """
+    alleles = {}
+    for _, position, alt in MUTATION.findall(observations):
+        aa = AMINO_ACIDS.get(alt)
+        if aa is None:
+            continue
+        current = alleles.get(position)
+        if current is None:
+            alleles[position] = aa
+        else:
+            values = current if isinstance(current, list) else [current]
+            if aa not in values:
+                alleles[position] = values + [aa]
+    if alleles:
+        return alleles, True
+
+    for low, high in RANGE.findall(observations):
+        alleles[f"{low}-{high}"] = ["Xxx"]
+    remaining = RANGE.sub(" ", observations)
+    for position in POSITION.findall(remaining):
+        alleles.setdefault(position, "Xxx")
+    return alleles, False
+
+
+def row_condition(row):
+    """Condición del JSON (sin reguladores) para una fila de la pestaña de scores."""
+    simple_value, doble_value = parse_values(row.get("VALUE", ""))
+    effect = "-" if "-" in row.get("EFFECT", "") else "+"
+    kind = row.get("TYPE OF MUTATION", "").lower()
+    alleles = {}
+    if kind.startswith("gain"):
+        alleles, specific = parse_alleles(row.get("OBSERVACIONES", ""))
+        mutation_type = "GOFO" if alleles and not specific else "GOF"
+    else:
+        mutation_type = "LOF"
+    return {
+        "mutation_type": mutation_type,
+        "effect": effect,
+        "simple_value": simple_value,
+        "doble_value": doble_value,
+        "alleles": alleles,
+    }
+
+
+def group_topology(rows):
+    """
+    Analiza una pestaña de grupo. Devuelve (mains, regulators, pooled):
+    genes principales, genes reguladores (en orden) y bombas sin VALUE que se
+    agrupan en una única clave.
+    """
+    loci = list(dict.fromkeys(row["LOCUS"] for row in rows))
+    pumps = [locus for locus in loci if any(r["LOCUS"] == locus and "-" in r.get("EFFECT", "") for r in rows)]
+    if pumps:
+        mains = pumps
+    else:
+        mains = [locus for locus in loci if any(r["LOCUS"] == locus and "*" in r.get("GENE", "") for r in rows)]
+    regulators = [locus for locus in loci if locus not in mains]
+    pooled = [locus for locus in mains if all(not r.get("VALUE") for r in rows if r["LOCUS"] == locus)]
+    return mains, regulators, pooled
+
+
+def excel_to_scores(xlsx_file):
+    """Convierte un Excel de scores en el diccionario con la estructura de SCORES_100WT.json."""
+    sheets = read_sheets(xlsx_file, (SCORES_SHEET,) + GROUP_SHEETS)
+    conditions = {}
+    order = []
+    for row in table_rows(sheets.get(SCORES_SHEET, [])):
+        key = (row["LOCUS"], row["ANTIBIOTIC"])
+        # Si un locus/antibiótico se repite se conserva la primera fila
+        if key not in conditions:
+            conditions[key] = row_condition(row)
+            order.append(key)
+
+    scores = {}
+    grouped = {}
+    regulator_loci = set()
+    for name in GROUP_SHEETS:
+        rows = table_rows(sheets.get(name, []))
+        if not rows:
+            continue
+        mains, regulators, pooled = group_topology(rows)
+        regulator_loci.update(regulators)
+
+        def regulator_block(ab):
+            return {locus: conditions[(locus, ab)] for locus in regulators if (locus, ab) in conditions}
+
+        for locus in mains:
+            if locus in pooled:
+                continue
+            entry = grouped.setdefault(locus, {})
+            for (row_locus, ab) in order:
+                if row_locus == locus:
+                    condition = dict(conditions[(locus, ab)])
+                    loci = regulator_block(ab)
+                    condition["regulators"] = "YES" if loci else "NO"
+                    if loci:
+                        condition["loci"] = loci
+                    entry[ab] = condition
+        if pooled:
+            entry = grouped.setdefault(",".join(pooled), {})
+            abs_ = list(dict.fromkeys(ab for (locus, ab) in order if locus in regulators))
+            for ab in abs_:
+                entry[ab] = {
+                    "mutation_type": "LOFN", "effect": "+", "simple_value": 0, "doble_value": 0,
+                    "alleles": {}, "regulators": "YES", "loci": regulator_block(ab),
+                }
+
+    pooled_first = {key.split(",")[0]: key for key in grouped if "," in key}
+    pooled_members = {locus for key in grouped if "," in key for locus in key.split(",")}
+    for locus, ab in order:
+        if locus in pooled_first and pooled_first[locus] not in scores:
+            scores[pooled_first[locus]] = grouped[pooled_first[locus]]
+        if locus in pooled_members or (locus in regulator_loci and locus not in grouped):
+            continue
+        if locus in grouped:
+            scores.setdefault(locus, grouped[locus])
+        else:
+            condition = dict(conditions[(locus, ab)])
+            condition["regulators"] = "NO"
+            scores.setdefault(locus, {})[ab] = condition
+    return scores
+
+
+def load_compiled_excel(xlsx_file, cache_dir=None):
+    """
+    Devuelve el Panel compilado de un Excel de scores. Se guarda en la caché de planes
+    (pickle) con el hash del Excel como clave, así que los procesos que lo cargan
+    después no necesitan volver a leer el Excel.
+    """
+    digest = file_digest(xlsx_file)
+    cache_dir = cache_dir or default_cache_dir()
+    cache_file = os.path.join(cache_dir, f"panel-v{PLAN_VERSION}-xlsx-{digest}.pickle")
+    panel = read_cached_panel(cache_file)
+    if panel is None:
+        panel = compile_scores(excel_to_scores(xlsx_file), digest=f"xlsx-{digest}")
+        write_cached_panel(cache_file, panel)
+    return panel
+
+if __name__ == "__main__":
+    # Exporta el panel derivado del Excel como JSON para revisarlo: panel_excel_rp.py SCORES.xlsx [salida.json]
+    scores = excel_to_scores(sys.argv[1])
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "w") as f:
+            json.dump(scores, f, indent=4, ensure_ascii=False)
+    else:
+        json.dump(scores, sys.stdout, indent=4, ensure_ascii=False)
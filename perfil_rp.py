@@ -0,0 +1,216 @@
+"""
+Instrumentación opcional del cálculo de scores.
+
+enable() sustituye las funciones del camino crítico de automatizacion_rp y
+automatizacion_rp_launcher por versiones que cuentan llamadas, tiempo acumulado y
+registros evaluados, por función, por regla (aislado, gen, antibiótico) y por
+aislado; disable() restaura las originales. Mientras está desactivada no hay
+ningún envoltorio, por lo que el coste es nulo.
+"""
+import json
+import time
+from functools import wraps
+
+import automatizacion_rp
+import automatizacion_rp_launcher
+
+
+# Funciones instrumentadas de cada módulo; las de lectura son generadores
+TIMED = {
+    automatizacion_rp: ["evaluate_condition", "evaluate_GOF", "evaluate_regulators", "evaluate_LOF",
+                        "evaluate_rule", "match_alleles", "evaluate_rule_regulators", "index_records",
+                        "index_variants"],
+    automatizacion_rp_launcher: ["load_csv"],
+}
+GENERATORS = {
+    automatizacion_rp_launcher: ["iter_csv", "iter_snippy"],
+}
+# Funciones cuya llamada corresponde a la evaluación de un registro
+RECORD_FUNCTIONS = {"evaluate_condition", "evaluate_rule", "evaluate_LOF"}
+
+# Perfilador activo (None si la instrumentación está desactivada)
+ACTIVE = None
+_originals = {}
+
+
+class Profiler:
+    """Acumula las métricas de la instrumentación y las exporta como diccionario/JSON."""
+
+    def __init__(self):
+        self.functions = {}
+        self.rules = {}
+        self.isolates = {}
+        self.isolate = None
+        self.records = 0
+
+    def add_function(self, name, elapsed, calls=1, rows=0):
+        stats = self.functions.setdefault(name, [0, 0.0, 0])
+        stats[0] += calls
+        stats[1] += elapsed
+        stats[2] += rows
+
+    def add_rule(self, key, elapsed, records, contributions=1):
+        stats = self.rules.setdefault(key, [0, 0.0, 0])
+        stats[0] += contributions
+        stats[1] += elapsed
+        stats[2] += records
+
+    def add_isolate(self, isolate, elapsed, records):
+        stats = self.isolates.setdefault(isolate, [0.0, 0])
+        stats[0] += elapsed
+        stats[1] += records
+
+    def reset(self):
+        self.functions.clear()
+        self.rules.clear()
+        self.isolates.clear()
+
+    def report(self):
+        """Informe con las métricas por función, por regla y por aislado."""
+        return {
+            "functions": {
+                name: {"calls": calls, "time_s": elapsed, "rows": rows}
+                for name, (calls, elapsed, rows) in sorted(self.functions.items())
+            },
+            "rules": [
+                {"isolate": isolate, "gene": gene, "antibiotic": ab, "branch": branch,
+                 "contributions": contributions, "time_s": elapsed, "records": records}
+                for (isolate, gene, ab, branch), (contributions, elapsed, records) in self.rules.items()
+            ],
+            "isolates": {
+                isolate: {"time_s": elapsed, "records": records}
+                for isolate, (elapsed, records) in self.isolates.items()
+            },
+        }
+
+    def merge(self, report):
+        """Suma un informe (p. ej. el de un proceso del pool) a este perfilador."""
+        for name, stats in report["functions"].items():
+            self.add_function(name, stats["time_s"], stats["calls"], stats["rows"])
+        for rule in report["rules"]:
+            key = (rule["isolate"], rule["gene"], rule["antibiotic"], rule["branch"])
+            self.add_rule(key, rule["time_s"], rule["records"], rule["contributions"])
+        for isolate, stats in report["isolates"].items():
+            self.add_isolate(isolate, stats["time_s"], stats["records"])
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def _timed(profiler, name, function):
+    counts_record = name in RECORD_FUNCTIONS
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.add_function(name, time.perf_counter() - start)
+            if counts_record:
+                profiler.records += 1
+    return wrapper
+
+
+def _timed_generator(profiler, name, function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        elapsed = 0.0
+        calls = 0
+        iterator = function(*args, **kwargs)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                calls += 1
+                yield item
+        finally:
+            profiler.add_function(name, elapsed, rows=calls)
+    return wrapper
+
+
+def _score_gene(profiler, function):
+    """Atribuye el tiempo y los registros evaluados a cada (aislado, gen, antibiótico)."""
+    @wraps(function)
+    def wrapper(entry, index, evaluate=None):
+        branch = "multi" if entry.multi else "single"
+        iterator = function(entry, index, evaluate)
+        key = None
+        while True:
+            start = time.perf_counter()
+            records = profiler.records
+            try:
+                ab, locus, score = next(iterator)
+            except StopIteration:
+                if key is not None:
+                    profiler.add_rule(key, time.perf_counter() - start, profiler.records - records, 0)
+                return
+            key = (profiler.isolate, entry.key, ab, branch)
+            profiler.add_rule(key, time.perf_counter() - start, profiler.records - records)
+            yield ab, locus, score
+    return wrapper
+
+
+def _score_records(profiler, function, name="score_records"):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        records = profiler.records
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            profiler.add_function(name, elapsed)
+            profiler.add_isolate(profiler.isolate, elapsed, profiler.records - records)
+    return wrapper
+
+
+def _main(profiler, function):
+    @wraps(function)
+    def wrapper(scores_json, records, isolate=None, sinks=()):
+        if isolate is not None:
+            profiler.isolate = isolate
+        return function(scores_json, records, isolate, sinks)
+    return wrapper
+
+
+def _patch(module, name, replacement):
+    _originals[(module, name)] = getattr(module, name)
+    setattr(module, name, replacement)
+
+
+def enable():
+    """Activa la instrumentación y devuelve el Profiler que acumula las métricas."""
+    global ACTIVE
+    if ACTIVE is not None:
+        return ACTIVE
+    profiler = Profiler()
+    for module, names in TIMED.items():
+        for name in names:
+            _patch(module, name, _timed(profiler, name, getattr(module, name)))
+    for module, names in GENERATORS.items():
+        for name in names:
+            _patch(module, name, _timed_generator(profiler, name, getattr(module, name)))
+    _patch(automatizacion_rp, "score_gene", _score_gene(profiler, automatizacion_rp.score_gene))
+    _patch(automatizacion_rp, "score_records", _score_records(profiler, automatizacion_rp.score_records))
+    _patch(automatizacion_rp, "score_panels",
+           _score_records(profiler, automatizacion_rp.score_panels, "score_panels"))
+    _patch(automatizacion_rp, "main", _main(profiler, automatizacion_rp.main))
+    ACTIVE = profiler
+    return profiler
+
+
+def disable():
+    """Desactiva la instrumentación restaurando las funciones originales."""
+    global ACTIVE
+    for (module, name), function in _originals.items():
+        setattr(module, name, function)
+    _originals.clear()
+    profiler, ACTIVE = ACTIVE, None
+    return profiler
@@ -0,0 +1,13 @@
+"""
+Punto de entrada de línea de comandos del cálculo de scores para tareas cortas
+(p. ej. una tarea de Nextflow por aislado). Acepta las mismas opciones que
+automatizacion_rp_launcher.py, pero al ser un script mínimo el intérprete no tiene
+que compilar el lanzador en cada arranque (se usa su .pyc) y las dependencias
+pesadas solo se importan en los caminos que las necesitan.
+
+    python puntuar_rp.py --isolate PA001.snps.withoutcommon.curated
+"""
+import automatizacion_rp_launcher
+
+if __name__ == "__main__":
+    automatizacion_rp_launcher.run()
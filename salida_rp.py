@@ -0,0 +1,207 @@
+import csv
+import json
+import sys
+
+from automatizacion_rp import ANTIBIOTICS
+
+
+# Número de aislados que se acumulan en memoria antes de escribirlos
+DEFAULT_BATCH_SIZE = 1000
+
+
+def score_value(value):
+    """
+    Score tal como se escribe en las tablas: los valores enteros se escriben sin
+    decimales (1 y no 1.0), tanto si vienen del bucle por aislado (enteros de Python)
+    como del motor columnar (float de NumPy).
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _score_values(scores):
+    # {antibiótico: score} o, con varios paneles, {panel: {antibiótico: score}}
+    return {name: _score_values(value) if isinstance(value, dict) else score_value(value)
+            for name, value in scores.items()}
+
+
+class _BufferedWriter:
+    """
+    Base de los escritores de resultados: acumula IsolateResult y los vuelca por
+    lotes de 'batch_size'. 'out' puede ser una ruta o un fichero ya abierto (que
+    no se cierra al terminar).
+    Con 'panels' (nombres de varios paneles) los resultados traen los scores por panel
+    ({panel: {antibiótico: score}}) y las tablas tienen una columna "panel:antibiótico"
+    por panel y antibiótico, con los paneles uno al lado del otro.
+    """
+
+    mode = "w"
+
+    def __init__(self, out, batch_size=DEFAULT_BATCH_SIZE, panels=None):
+        self.batch_size = batch_size
+        self.panels = panels
+        self.buffer = []
+        self.started = False
+        if isinstance(out, str):
+            self.file = open(out, self.mode, newline="") if self.mode else None
+            self.path = out
+            self.owned = True
+        else:
+            self.file = out
+            self.path = None
+            self.owned = False
+
+    def write(self, result):
+        self.buffer.append(result)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def write_all(self, results):
+        for result in results:
+            self.write(result)
+
+    def flush(self):
+        if self.buffer:
+            self._write_batch(self.buffer)
+            self.buffer = []
+            self.started = True
+
+    def close(self):
+        self.flush()
+        if not self.started:
+            self._write_batch([])
+        self._close()
+        if self.owned and self.file is not None:
+            self.file.close()
+
+    def _close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_batch(self, results):
+        raise NotImplementedError
+
+    def _columns(self):
+        """Nombres de las columnas de scores de las tablas."""
+        if self.panels is None:
+            return list(ANTIBIOTICS)
+        return [f"{panel}:{ab}" for panel in self.panels for ab in ANTIBIOTICS]
+
+    def _values(self, result):
+        """Scores de un resultado en el orden de _columns()."""
+        if self.panels is None:
+            return [score_value(result.scores[ab]) for ab in ANTIBIOTICS]
+        return [score_value(result.scores[panel][ab]) for panel in self.panels for ab in ANTIBIOTICS]
+
+
+class CsvWriter(_BufferedWriter):
+    """Tabla ISOLATE,CIP,CAZ,MER,C/T,TOB con un aislado por fila."""
+
+    def _write_batch(self, results):
+        writer = csv.writer(self.file)
+        if not self.started:
+            writer.writerow(["ISOLATE"] + self._columns())
+        writer.writerows([result.isolate] + self._values(result) for result in results)
+        self.file.flush()
+
+
+class JsonLinesWriter(_BufferedWriter):
+    """Un objeto JSON por aislado con los totales y, si existe, el desglose por locus."""
+
+    def _write_batch(self, results):
+        lines = []
+        for result in results:
+            item = {"isolate": result.isolate, "scores": _score_values(result.scores)}
+            if result.score_eval is not None:
+                item["score_eval"] = result.score_eval
+            lines.append(json.dumps(item, separators=(",", ":")))
+        if lines:
+            self.file.write("\n".join(lines) + "\n")
+            self.file.flush()
+
+
+class ParquetWriter(_BufferedWriter):
+    """
+    Tabla columnar Parquet (una columna por antibiótico), escrita con pyarrow por
+    grupos de filas de 'batch_size' aislados. Requiere una ruta de salida.
+    """
+
+    mode = None
+
+    def __init__(self, out, batch_size=DEFAULT_BATCH_SIZE, panels=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("La salida Parquet necesita pyarrow (pip install pyarrow)")
+        if not isinstance(out, str):
+            raise ValueError("La salida Parquet necesita una ruta de fichero")
+        super().__init__(out, batch_size, panels)
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema(
+            [("ISOLATE", pyarrow.string())] + [(column, pyarrow.float64()) for column in self._columns()]
+        )
+        self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+    def _write_batch(self, results):
+        columns = {"ISOLATE": [result.isolate for result in results]}
+        rows = [self._values(result) for result in results]
+        for number, column in enumerate(self._columns()):
+            columns[column] = [float(row[number]) for row in rows]
+        self.writer.write_table(self.pyarrow.table(columns, schema=self.schema))
+
+    def _close(self):
+        self.writer.close()
+
+
+class ConsoleWriter:
+    """
+    Salida legible por consola de un aislado, con el formato original de main().
+    Con 'panels' se escribe un bloque con ese formato por panel.
+    """
+
+    def __init__(self, out=None, panels=None):
+        self.file = out or sys.stdout
+        self.panels = panels
+
+    def write(self, result):
+        if self.panels is None:
+            self._write_scores(result.scores, result.score_eval)
+            return
+        for panel in self.panels:
+            print(f"== {panel} ==", file=self.file)
+            self._write_scores(result.scores[panel], (result.score_eval or {}).get(panel))
+
+    def _write_scores(self, scores, score_eval):
+        print("Total scores by ATB:", file=self.file)
+        for ab, score in scores.items():
+            print(f"{ab}: {score}", file=self.file)
+        for ab, scores in (score_eval or {}).items():
+            print(f"{ab}: {scores}", file=self.file)
+
+    def write_all(self, results):
+        for result in results:
+            self.write(result)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonLinesWriter, "parquet": ParquetWriter}
+
+
+def open_writer(fmt, out=None, batch_size=DEFAULT_BATCH_SIZE, panels=None):
+    """Crea el escritor del formato indicado sobre 'out' (ruta) o la salida estándar."""
+    return WRITERS[fmt](out if out else sys.stdout, batch_size, panels)
@@ -0,0 +1,267 @@
+"""
+Servicio de cálculo de scores de baja latencia (asyncio).
+
+Mantiene el panel compilado en memoria y atiende peticiones HTTP por TCP o por un
+socket Unix; el cálculo de cada aislado se hace en un pool de procesos que ya tiene
+el panel cargado. Si el fichero de scores cambia, se compila el panel nuevo y se
+arranca un pool nuevo; las peticiones en curso terminan en el pool anterior con el
+panel con el que empezaron.
+
+    python servidor_rp.py --port 8765
+    python servidor_rp.py --unix /tmp/scores_rp.sock
+
+    curl --data-binary @PA001.snps.withoutcommon.curated 'http://127.0.0.1:8765/score?isolate=PA001'
+    curl --unix-socket /tmp/scores_rp.sock --data-binary @snps.csv 'http://localhost/score?isolate=PA001'
+
+Rutas:
+    POST /score?isolate=NOMBRE&format=auto|curated|snippy   cuerpo: fichero de variantes
+    GET  /health                                             panel cargado
+    POST /reload                                             recargar el panel ahora
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import automatizacion_rp
+from automatizacion_rp_launcher import DEFAULT_SCORES, FORMATS, iter_curated_lines, iter_snippy_lines
+from compilacion_rp import load_panel
+
+
+# Tamaño máximo del cuerpo de una petición
+DEFAULT_MAX_BODY_BYTES = 64 * 1024 * 1024
+# Segundos entre comprobaciones de cambios en el fichero de scores
+DEFAULT_POLL_INTERVAL = 2.0
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           501: "Not Implemented"}
+
+# Panel de cada proceso del pool; se recibe una sola vez en el initializer
+_worker_panel = None
+
+
+def _init_worker(panel):
+    global _worker_panel
+    _worker_panel = panel
+
+
+def score_payload(panel, text, isolate, fmt="auto"):
+    """Puntúa el contenido de un fichero de variantes (curado o snps.csv de snippy) ya leído en memoria."""
+    lines = text.splitlines()
+    if fmt == "auto":
+        fmt = "snippy" if lines and lines[0].startswith("CHROM,") else "curated"
+    if fmt == "snippy":
+        records = iter_snippy_lines(lines, panel.loci, isolate)
+    else:
+        records = iter_curated_lines(lines, panel.loci)
+    final_scores, final_score_eval = automatizacion_rp.score_records(panel, records)
+    return automatizacion_rp.IsolateResult(isolate, final_scores, final_score_eval)
+
+
+def _score_in_worker(text, isolate, fmt):
+    return score_payload(_worker_panel, text, isolate, fmt)
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ScoringServer:
+    """
+    Servidor con el panel en memoria. 'panel' y 'executor' se sustituyen juntos al
+    recargar, y cada petición usa los que había al empezar.
+    """
+
+    def __init__(self, scores_file=DEFAULT_SCORES, workers=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+        self.scores_file = scores_file
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_body_bytes = max_body_bytes
+        self.panel = None
+        self.executor = None
+        self.stamp = None
+        self.failed_stamp = None
+        self.reload_lock = asyncio.Lock()
+
+    def _file_stamp(self):
+        stat = os.stat(self.scores_file)
+        return stat.st_mtime_ns, stat.st_size
+
+    async def reload(self, force=False):
+        """
+        Recarga el panel si el fichero ha cambiado (o siempre con 'force'). Si el
+        fichero nuevo no se puede compilar se conserva el panel anterior.
+        """
+        async with self.reload_lock:
+            stamp = self._file_stamp()
+            if not force and stamp in (self.stamp, self.failed_stamp):
+                return False
+            loop = asyncio.get_running_loop()
+            try:
+                panel = await loop.run_in_executor(None, load_panel, self.scores_file)
+            except Exception:
+                # No se reintenta hasta que el fichero vuelva a cambiar
+                self.failed_stamp = stamp
+                raise
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(panel,))
+            old_executor = self.executor
+            self.panel, self.executor, self.stamp = panel, executor, stamp
+            if old_executor is not None:
+                # Sin esperar: las tareas ya enviadas al pool anterior terminan igualmente
+                old_executor.shutdown(wait=False)
+            print(f"Panel cargado: {self.scores_file} ({panel.digest})", file=sys.stderr)
+            return True
+
+    async def watch(self):
+        """Comprueba periódicamente si el fichero de scores ha cambiado."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.reload()
+            except Exception as error:
+                print(f"No se pudo recargar el panel: {error}", file=sys.stderr)
+
+    async def score(self, body, query):
+        fmt = query.get("format", ["auto"])[0]
+        if fmt not in FORMATS:
+            raise HttpError(400, f"formato desconocido: {fmt}")
+        isolate = query.get("isolate", ["payload"])[0]
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError:
+            raise HttpError(400, "el cuerpo debe ser texto UTF-8")
+        panel, executor = self.panel, self.executor
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(executor, _score_in_worker, text, isolate, fmt)
+        return {"isolate": result.isolate, "scores": result.scores, "score_eval": result.score_eval,
+                "panel": panel.digest}
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == "/score":
+            if method != "POST":
+                raise HttpError(405, "usar POST")
+            return await self.score(body, query)
+        if url.path == "/health":
+            return {"status": "ok", "panel": self.panel.digest, "genes": len(self.panel.genes),
+                    "scores_file": self.scores_file}
+        if url.path == "/reload":
+            if method != "POST":
+                raise HttpError(405, "usar POST")
+            reloaded = await self.reload(force=True)
+            return {"reloaded": reloaded, "panel": self.panel.digest}
+        raise HttpError(404, f"ruta desconocida: {url.path}")
+
+    async def read_request(self, reader):
+        """Lee una petición HTTP/1.1; devuelve (method, target, body) o None si se cerró la conexión."""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "línea de petición no válida")
+        length = None
+        chunked = False
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                try:
+                    length = int(value.strip())
+                except ValueError:
+                    raise HttpError(400, "Content-Length no válido")
+                if length < 0:
+                    raise HttpError(400, "Content-Length no válido")
+            elif name == "transfer-encoding":
+                chunked = True
+        # Un cuerpo que no se puede leer entero no se puntúa como si estuviera vacío
+        if chunked:
+            raise HttpError(501, "Transfer-Encoding no soportado; enviar el cuerpo con Content-Length")
+        if length is None:
+            if urlsplit(target).path == "/score":
+                raise HttpError(411, "falta Content-Length")
+            length = 0
+        if length > self.max_body_bytes:
+            raise HttpError(413, f"el cuerpo supera {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, body
+
+    async def handle(self, reader, writer):
+        """Atiende una conexión: una petición y su respuesta JSON."""
+        status = 200
+        try:
+            request = await self.read_request(reader)
+            if request is None:
+                return
+            payload = await self.route(*request)
+        except HttpError as error:
+            status, payload = error.status, {"error": str(error)}
+        except asyncio.IncompleteReadError:
+            status, payload = 400, {"error": "cuerpo incompleto"}
+        except Exception as error:
+            status, payload = 500, {"error": f"{type(error).__name__}: {error}"}
+        data = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None):
+        await self.reload(force=True)
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+            print(f"Escuchando en {unix_path}", file=sys.stderr)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print(f"Escuchando en http://{host}:{port}", file=sys.stderr)
+        watcher = asyncio.create_task(self.watch()) if self.poll_interval > 0 else None
+        # SIGTERM detiene el servidor limpiamente (se cierra el pool y se borra el socket)
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            self.executor.shutdown(wait=True)
+            if unix_path and os.path.exists(unix_path):
+                os.unlink(unix_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio de cálculo de scores con el panel en memoria.")
+    parser.add_argument("--scores", default=DEFAULT_SCORES, help="JSON o Excel (.xlsx) de scores (por defecto %(default)s)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="escuchar en un socket Unix en lugar de TCP")
+    parser.add_argument("--workers", type=int, default=None, help="procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="segundos entre comprobaciones de cambios del fichero de scores (0 desactiva la recarga)")
+    parser.add_argument("--max-body-mb", type=float, default=DEFAULT_MAX_BODY_BYTES / (1024 * 1024),
+                        help="tamaño máximo del cuerpo de una petición en MB")
+    args = parser.parse_args(argv)
+
+    server = ScoringServer(args.scores, args.workers, args.poll_interval, int(args.max_body_mb * 1024 * 1024))
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()